@@ -9,21 +9,38 @@ DELETE /api/embeddings/delete
 Deletes all embeddings for a specific model from a namespace (async).
 """
 
+import asyncio
+import io
 import logging
+import multiprocessing
 import threading
+import time
 import json
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from functools import lru_cache
 from typing import Optional
 
+import numpy as np
 from openai import OpenAI
+import psycopg2.errors
 import psycopg2.extras
+from psycopg2.extensions import AsIs, register_adapter
+from psycopg2.extras import execute_values
 
-from app.config import NAMESPACE
+from app.config import (
+    NAMESPACE,
+    REEMBED_BATCH_SIZE,
+    EMBEDDING_CONCURRENCY,
+    EMBEDDING_DIMS_CACHE_TTL,
+    REEMBED_DROP_INDEX,
+    USE_HALFVEC,
+    EMBEDDING_NATIVE,
+)
 from app.database import (
     get_db_connection,
     get_existing_embedding_tables,
     table_exists,
     create_embedding_table,
-    add_embedding_to_state,
     remove_embedding_from_state,
 )
 from app.encryption import decode_or_decrypt_content
@@ -31,10 +48,44 @@ from app.encryption import decode_or_decrypt_content
 logger = logging.getLogger(__name__)
 
 
+def _adapt_ndarray(arr: "np.ndarray") -> AsIs:
+    """Adapt a numpy array to a pgvector text literal for psycopg2."""
+    return AsIs("'[" + ",".join(map(repr, arr.tolist())) + "]'")
+
+
+# Embeddings are held as float32 numpy arrays instead of list[float]:
+# a 1536-D vector is ~6 KB contiguous instead of ~43 KB of boxed Python
+# floats, which matters when thousands of vectors are in flight at once
+register_adapter(np.ndarray, _adapt_ndarray)
+
+# Cache of detected dimensions keyed by (url, model, requested_dims) so
+# repeated API calls with the same model don't each pay a test HTTP request.
+# Values are (detected_at, dims); entries expire after EMBEDDING_DIMS_CACHE_TTL.
+_DIMS_CACHE: dict[tuple[str, str, Optional[int]], tuple[float, int]] = {}
+_dims_cache_lock = threading.Lock()
+
+
+@lru_cache(maxsize=16)
+def _get_openai_client(base_url: str, api_key: str) -> OpenAI:
+    """
+    Get (or create) an OpenAI client for an endpoint.
+
+    Cached per (base_url, api_key): each OpenAI() construction builds a
+    fresh httpx client with its own TLS context and connection pool, so
+    reusing one client means dimension detection and re-embed batches
+    share keep-alive connections instead of re-handshaking.
+    """
+    return OpenAI(base_url=base_url, api_key=api_key)
+
+
 def _detect_embedding_dimensions(client: OpenAI, model: str, requested_dims: Optional[int] = None) -> int:
     """
     Detect embedding dimensions by calling the API with test text.
-    
+
+    Results are cached in-process per (endpoint URL, model, requested_dims)
+    for EMBEDDING_DIMS_CACHE_TTL seconds, so re-running a job with the same
+    model skips the test request entirely.
+
     Args:
         client: OpenAI client configured for the embedding endpoint
         model: Model name to test
@@ -47,6 +98,15 @@ def _detect_embedding_dimensions(client: OpenAI, model: str, requested_dims: Opt
         Exception if the model doesn't return valid embeddings
         ValueError if requested_dims doesn't match actual returned dimensions
     """
+    cache_key = (str(client.base_url), model, requested_dims)
+    with _dims_cache_lock:
+        cached = _DIMS_CACHE.get(cache_key)
+        if cached is not None:
+            detected_at, cached_dims = cached
+            if time.time() - detected_at < EMBEDDING_DIMS_CACHE_TTL:
+                logger.debug(f"📋 Using cached embedding dimensions for {model}: {cached_dims}D")
+                return cached_dims
+
     try:
         # Build API call - only include dimensions if requested_dims is set
         api_kwargs = {
@@ -80,6 +140,9 @@ def _detect_embedding_dimensions(client: OpenAI, model: str, requested_dims: Opt
                 f"Either remove embedding_dims to use native dimensions, or use an MRL-capable model."
             )
         
+        with _dims_cache_lock:
+            _DIMS_CACHE[cache_key] = (time.time(), actual_dims)
+
         if requested_dims is not None:
             logger.info(f"✓ Validated embedding dimensions for {model}: {actual_dims}D (embedding_dims={requested_dims})")
         else:
@@ -90,7 +153,7 @@ def _detect_embedding_dimensions(client: OpenAI, model: str, requested_dims: Opt
         raise Exception(f"Failed to detect dimensions for model '{model}': {str(e)}")
 
 
-def _get_embedding(client: OpenAI, model: str, text: str, dims: Optional[int] = None) -> list[float]:
+def _get_embedding(client: OpenAI, model: str, text: str, dims: Optional[int] = None) -> np.ndarray:
     """
     Generate embedding for text using the provided client and model.
     
@@ -109,7 +172,47 @@ def _get_embedding(client: OpenAI, model: str, text: str, dims: Optional[int] =
         api_kwargs["dimensions"] = dims
     
     response = client.embeddings.create(**api_kwargs)
-    return response.data[0].embedding
+    return np.asarray(response.data[0].embedding, dtype=np.float32)
+
+
+def _get_embeddings_batch(client: OpenAI, model: str, texts: list[str], dims: Optional[int] = None) -> list[np.ndarray]:
+    """
+    Generate embeddings for multiple texts in a single API call.
+
+    Embeddings are returned index-aligned with the input list per the
+    OpenAI embeddings spec, so one HTTP round-trip covers the whole batch.
+
+    Args:
+        client: OpenAI client configured for the embedding endpoint
+        model: Model name
+        texts: Texts to embed (one API call for all of them)
+        dims: Optional dimension count to request (for MRL models)
+    """
+    # Build API call - only include dimensions if dims is set
+    api_kwargs = {
+        "model": model,
+        "input": texts,
+    }
+    if dims is not None:
+        api_kwargs["dimensions"] = dims
+
+    response = client.embeddings.create(**api_kwargs)
+    return [np.asarray(item.embedding, dtype=np.float32) for item in response.data]
+
+
+def _copy_escape(value: str) -> str:
+    """
+    Escape a text field for PostgreSQL COPY text format.
+
+    Backslash, tab, newline and carriage return are the characters COPY
+    treats specially; anything else passes through verbatim.
+    """
+    return (
+        value.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
 
 
 def _do_reembedding(
@@ -136,66 +239,323 @@ def _do_reembedding(
         table_name: Embedding table name (e.g., memory_768)
         requested_dims: Optional dimension count to request from API (for MRL models)
     """
+    # This is the target of a spawned child process, which starts with a
+    # clean interpreter and never runs server.py's logging setup - without
+    # this the job's INFO output (start, progress, summary) vanishes
+    logging.basicConfig(level=logging.INFO)
+
     namespace_display = namespace if namespace else "(all namespaces)"
     dims_display = f", embedding_dims={requested_dims}" if requested_dims is not None else ""
     logger.info(f"🚀 Starting re-embedding job: model={embedding_model}{dims_display}, namespace={namespace_display}, table={table_name}")
     
-    # Create dedicated OpenAI client for this job
-    client = OpenAI(
-        base_url=embedding_url,
-        api_key=embedding_api_key or "not-needed",
-    )
-    
+    # Shared (cached) OpenAI client for this endpoint
+    client = _get_openai_client(embedding_url, embedding_api_key or "not-needed")
+
+    # Optional native path: against a local endpoint the HTTP hop (TLS,
+    # JSON serialize/parse) can cost several times the actual inference,
+    # so with EMBEDDING_NATIVE=true the model runs in-process via fastembed
+    local_model = None
+    if EMBEDDING_NATIVE and any(host in embedding_url for host in ("localhost", "127.0.0.1")):
+        try:
+            from fastembed import TextEmbedding  # optional dependency
+
+            local_model = TextEmbedding(embedding_model)
+            logger.info(f"⚡ Embedding natively via fastembed (EMBEDDING_NATIVE=true): {embedding_model}")
+        except ImportError:
+            logger.warning("⚠️ EMBEDDING_NATIVE=true but fastembed is not installed - using HTTP endpoint")
+        except Exception as e:
+            logger.warning(f"⚠️ fastembed could not load '{embedding_model}' ({str(e)}) - using HTTP endpoint")
+    
+    # Writes go through a standard cursor; reads stream through a server-side
+    # named cursor on a separate connection (named cursors hold their portal
+    # open, so mixing writes into the same transaction gets awkward)
     conn = get_db_connection()
     cur = conn.cursor()
-    
+    read_conn = get_db_connection()
+    read_cur = read_conn.cursor(name="reembed_cursor")
+    read_cur.itersize = 1000
+
+    # ANN index handling for large jobs (set in the try block, used in finally)
+    ann_index_name = None
+    ann_index_def = None
+
     try:
         # Build query to find memories that DON'T have embeddings for this model yet
-        # The model is stored in state.embedding_tables.{table_name} array
         where_clauses = []
         params = []
-        
+
         # Only filter by namespace if it's set (empty = all namespaces)
         if namespace:
-            where_clauses.append("namespace = %s")
+            where_clauses.append("m.namespace = %s")
             params.append(namespace)
-        
-        # Filter for memories missing this model in their state
-        where_clauses.append("""
-            NOT (
-                COALESCE(state->'embedding_tables'->%s, '[]'::jsonb) @> %s::jsonb
+
+        # Anti-join against the embedding table itself rather than testing
+        # state.embedding_tables with jsonb containment - the jsonb filter
+        # forces per-row path extraction with no usable index, while the
+        # anti-join walks the UNIQUE(memory_id, embedding_model) index and
+        # treats the embedding table as the source of truth
+        where_clauses.append(f"""
+            NOT EXISTS (
+                SELECT 1 FROM {table_name} e
+                WHERE e.memory_id = m.id
+                AND e.embedding_model = %s
             )
         """)
-        params.extend([table_name, json.dumps([embedding_model])])
-        
-        sql = f"""
-            SELECT id, content, enc, state, namespace
-            FROM memories 
-            WHERE {' AND '.join(where_clauses)};
-        """
-        cur.execute(sql, params)
-        
-        memories = cur.fetchall()
-        total = len(memories)
-        
+        params.append(embedding_model)
+
+        where_sql = ' AND '.join(where_clauses)
+
+        # Lightweight count first so progress logging has a total, then stream
+        # the rows themselves instead of materializing every memory in RAM
+        cur.execute(f"SELECT count(*) FROM memories m WHERE {where_sql};", params)
+        total = cur.fetchone()[0]
+
         if total == 0:
             logger.info(f"✅ No memories need re-embedding for model {embedding_model}")
             return
-        
+
         logger.info(f"📊 Found {total} memories to re-embed")
+
+        if REEMBED_DROP_INDEX and total > 50_000:
+            # ANN index maintenance dominates insert cost at this scale -
+            # drop it now and rebuild it once after the bulk load. Discover
+            # the definition from pg_indexes so it's recreated identically.
+            cur.execute("""
+                SELECT indexname, indexdef
+                FROM pg_indexes
+                WHERE schemaname = 'public'
+                AND tablename = %s
+                AND (indexdef ILIKE '%%USING hnsw%%' OR indexdef ILIKE '%%USING ivfflat%%');
+            """, (table_name,))
+            row = cur.fetchone()
+            conn.rollback()  # end the read transaction before DDL in autocommit
+            if row:
+                ann_index_name, ann_index_def = row
+                logger.info(f"🔨 Dropping ANN index {ann_index_name} for bulk load (REEMBED_DROP_INDEX=true)")
+                conn.autocommit = True
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {ann_index_name};")
+                conn.autocommit = False
+
+        read_cur.execute(f"""
+            SELECT m.id, m.content, m.enc, m.state, m.namespace
+            FROM memories m
+            WHERE {where_sql};
+        """, params)
         
         processed = 0
         skipped = 0
         errors = 0
-        
-        for row in memories:
-            memory_id, content_bytes, is_encrypted, state, memory_namespace = row
-            is_encrypted = is_encrypted if is_encrypted is not None else False
-            
+        dims_validated = False
+
+        # For very large jobs, COPY beats execute_values by a wide margin.
+        # COPY has no ON CONFLICT, so rows are staged into a temp table
+        # and merged from there (created lazily on the first batch).
+        use_copy = total > 10_000
+        copy_table_ready = False
+
+        # Storage type must match how create_embedding_table builds tables
+        vector_cast = "halfvec" if USE_HALFVEC else "vector"
+
+        # The state UPDATE runs once per batch with identical SQL text, so
+        # PostgreSQL would re-parse and re-plan it every time - PREPARE it
+        # once per job and EXECUTE per batch instead (deallocated in finally
+        # since the pooled connection outlives the job)
+        cur.execute("""
+            PREPARE reembed_state_update (text, jsonb, bigint[]) AS
+            UPDATE memories
+            SET state = jsonb_set(
+                jsonb_set(
+                    COALESCE(state, '{}'::jsonb),
+                    '{embedding_tables}',
+                    COALESCE(state->'embedding_tables', '{}'::jsonb),
+                    true
+                ),
+                ARRAY['embedding_tables', $1],
+                COALESCE(state->'embedding_tables'->$1, '[]'::jsonb) || $2,
+                true
+            )
+            WHERE id = ANY($3)
+            AND NOT (COALESCE(state->'embedding_tables'->$1, '[]'::jsonb) @> $2);
+        """)
+
+        def _embed_batch(batch: list[tuple[int, str, str]]) -> tuple[list[tuple[int, str, np.ndarray]], int]:
+            """
+            Embed a batch of memories with one API call (HTTP only, no DB access).
+
+            Runs on an executor worker thread - must not touch the psycopg2
+            connection, which is not thread-safe.
+
+            Returns:
+                (embedded, batch_errors) where embedded is a list of
+                (memory_id, namespace, embedding) tuples
+            """
+            batch_errors = 0
+            embedded: list[tuple[int, str, np.ndarray]] = []
+
             try:
+                if local_model is not None:
+                    # In-process inference - ONNX Runtime parallelizes across
+                    # cores itself (parallel=0); a dims mismatch against the
+                    # table is caught by the first-batch validation
+                    embeddings = [
+                        np.asarray(e, dtype=np.float32)
+                        for e in local_model.embed([content for _, _, content in batch], parallel=0)
+                    ]
+                else:
+                    # One HTTP round-trip for the whole batch (pass requested_dims for MRL models)
+                    embeddings = _get_embeddings_batch(
+                        client, embedding_model, [content for _, _, content in batch], requested_dims
+                    )
+                embedded = [
+                    (memory_id, memory_namespace, embedding)
+                    for (memory_id, memory_namespace, _), embedding in zip(batch, embeddings)
+                ]
+
+            except Exception as e:
+                # Batch call failed - fall back to single-item calls so one bad
+                # item doesn't take down the whole batch
+                logger.warning(f"⚠️ Batch embedding call failed ({str(e)}), retrying items individually")
+
+                for memory_id, memory_namespace, content in batch:
+                    try:
+                        embedding = _get_embedding(client, embedding_model, content, requested_dims)
+                        embedded.append((memory_id, memory_namespace, embedding))
+                    except Exception as item_e:
+                        logger.error(f"❌ Error re-embedding memory #{memory_id}: {str(item_e)}")
+                        batch_errors += 1
+
+            return embedded, batch_errors
+
+        def _write_batch(embedded: list[tuple[int, str, np.ndarray]]) -> None:
+            """Store a batch of generated embeddings (DB only, main thread)."""
+            nonlocal processed, dims_validated
+
+            # Lazy dimension validation: the handler skips the eager test
+            # request when embedding_dims is supplied, so the first real
+            # batch is checked here and a mismatch aborts the whole job
+            if not dims_validated:
+                actual_dims = len(embedded[0][2])
+                if actual_dims != dims:
+                    raise ValueError(
+                        f"Model '{embedding_model}' returned {actual_dims}-dimension embeddings "
+                        f"but table {table_name} expects {dims}. Aborting job."
+                    )
+                dims_validated = True
+
+            if use_copy:
+                nonlocal copy_table_ready
+                if not copy_table_ready:
+                    cur.execute(f"""
+                        DROP TABLE IF EXISTS reembed_stage;
+                        CREATE TEMP TABLE reembed_stage (
+                            memory_id BIGINT,
+                            embedding {vector_cast.upper()}({dims}),
+                            namespace VARCHAR(100),
+                            embedding_model VARCHAR(255)
+                        );
+                    """)
+                    copy_table_ready = True
+
+                # Stream the batch as TSV through COPY into the staging
+                # table. Every text field goes through _copy_escape - the
+                # model name comes straight from the request body, and one
+                # stray tab/newline/CR would corrupt the COPY stream
+                buf = io.StringIO()
+                model_esc = _copy_escape(embedding_model)
+                for memory_id, memory_namespace, embedding in embedded:
+                    vector_text = "[" + ",".join(map(str, embedding)) + "]"
+                    ns = _copy_escape(memory_namespace)
+                    buf.write(f"{memory_id}\t{vector_text}\t{ns}\t{model_esc}\n")
+                buf.seek(0)
+
+                cur.execute("TRUNCATE reembed_stage;")
+                cur.copy_expert(
+                    "COPY reembed_stage (memory_id, embedding, namespace, embedding_model) FROM STDIN WITH (FORMAT text)",
+                    buf,
+                )
+                cur.execute(f"""
+                    INSERT INTO {table_name} (memory_id, embedding, namespace, embedding_model)
+                    SELECT memory_id, embedding, namespace, embedding_model
+                    FROM reembed_stage
+                    ON CONFLICT (memory_id, embedding_model) DO NOTHING;
+                """)
+            else:
+                # Bulk insert all embeddings for this batch in one statement.
+                # The SELECT pre-filtered rows that already have this model, so
+                # conflicts are rare - skip ON CONFLICT on the common path and only
+                # fall back to it when a batch actually conflicts.
+                insert_rows = [
+                    (memory_id, embedding, memory_namespace, embedding_model)
+                    for memory_id, memory_namespace, embedding in embedded
+                ]
+                cur.execute("SAVEPOINT reembed_batch;")
+                try:
+                    execute_values(cur, f"""
+                        INSERT INTO {table_name} (memory_id, embedding, namespace, embedding_model)
+                        VALUES %s;
+                    """, insert_rows, template=f"(%s, %s::{vector_cast}, %s, %s)", page_size=500)
+                except psycopg2.errors.UniqueViolation:
+                    logger.warning(f"⚠️ Duplicate embedding in batch, retrying batch with conflict handling")
+                    cur.execute("ROLLBACK TO SAVEPOINT reembed_batch;")
+                    execute_values(cur, f"""
+                        INSERT INTO {table_name} (memory_id, embedding, namespace, embedding_model)
+                        VALUES %s
+                        ON CONFLICT (memory_id, embedding_model) DO NOTHING;
+                    """, insert_rows, template=f"(%s, %s::{vector_cast}, %s, %s)", page_size=500)
+                cur.execute("RELEASE SAVEPOINT reembed_batch;")
+
+            # Update state.embedding_tables for the whole batch in one
+            # EXECUTE of the statement prepared at job start
+            batch_ids = [memory_id for memory_id, _, _ in embedded]
+            cur.execute(
+                "EXECUTE reembed_state_update (%s, %s, %s);",
+                (table_name, json.dumps([embedding_model]), batch_ids),
+            )
+
+            # Commit per batch so progress is durable - a crash mid-job
+            # resumes from the remaining memories instead of rolling back
+            # everything processed so far
+            conn.commit()
+
+            processed += len(embedded)
+
+            # Log progress per batch
+            logger.info(f"📈 Progress: {processed}/{total} memories re-embedded")
+
+        def _drain(done_futures) -> None:
+            """Collect finished embed futures and write their results."""
+            nonlocal errors
+            for future in done_futures:
+                embedded, batch_errors = future.result()
+                errors += batch_errors
+                if embedded:
+                    _write_batch(embedded)
+                # Embedding batches run to hundreds of KB - release this
+                # loop's reference as soon as the batch is written
+                del embedded
+
+        # Stream rows from the server-side cursor (itersize rows per fetch),
+        # decode/decrypt as we go, and hand full batches to the executor.
+        # In-flight batches are capped so a huge table never piles up in RAM.
+        # The OpenAI client is thread-safe but the psycopg2 connection is not,
+        # so all DB writes happen on this thread as batches complete.
+        max_in_flight = EMBEDDING_CONCURRENCY * 2
+
+        # Native embedding is CPU-bound and ONNX already uses every core -
+        # extra threads would only contend, so parallelize the HTTP path only
+        workers = 1 if local_model is not None else EMBEDDING_CONCURRENCY
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending: set = set()
+            batch: list[tuple[int, str, str]] = []
+
+            for row in read_cur:
+                memory_id, content_bytes, is_encrypted, state, memory_namespace = row
+                is_encrypted = is_encrypted if is_encrypted is not None else False
+
                 # Decode or decrypt content
-                content = decode_or_decrypt_content(bytes(content_bytes), is_encrypted)
-                
+                content = decode_or_decrypt_content(content_bytes, is_encrypted)
+
                 if content is None:
                     if is_encrypted:
                         logger.warning(f"⚠️ Skipping memory #{memory_id}: encrypted but ENCRYPTION_KEY not set")
@@ -203,38 +563,64 @@ def _do_reembedding(
                         logger.warning(f"⚠️ Skipping memory #{memory_id}: could not decode content")
                     skipped += 1
                     continue
-                
-                # Generate new embedding (pass requested_dims for MRL models)
-                embedding = _get_embedding(client, embedding_model, content, requested_dims)
-                
-                # Insert into embedding table (use memory's actual namespace)
-                cur.execute(f"""
-                    INSERT INTO {table_name} (memory_id, embedding, namespace, embedding_model)
-                    VALUES (%s, %s::vector, %s, %s)
-                    ON CONFLICT (memory_id, embedding_model) DO NOTHING;
-                """, (memory_id, embedding, memory_namespace, embedding_model))
-                
-                # Update state.embedding_tables to include new model
-                add_embedding_to_state(memory_id, table_name, embedding_model)
-                
-                processed += 1
-                
-                # Log progress periodically
-                if processed % 10 == 0:
-                    logger.info(f"📈 Progress: {processed}/{total} memories re-embedded")
-                
-            except Exception as e:
-                logger.error(f"❌ Error re-embedding memory #{memory_id}: {str(e)}")
-                errors += 1
-                continue
-        
-        conn.commit()
+
+                batch.append((memory_id, memory_namespace, content))
+
+                # Drop per-row transients eagerly - content can be large and
+                # these locals would otherwise pin the previous row's data
+                # while this thread blocks waiting on in-flight batches
+                del row, content_bytes, content
+
+                if len(batch) >= REEMBED_BATCH_SIZE:
+                    pending.add(executor.submit(_embed_batch, batch))
+                    batch = []
+
+                    if len(pending) >= max_in_flight:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        _drain(done)
+                        # Drop completed futures (each holds its result batch)
+                        del done
+
+            # Trailing partial batch
+            if batch:
+                pending.add(executor.submit(_embed_batch, batch))
+
+            _drain(as_completed(pending))
+
+        if copy_table_ready:
+            # Drop the staging table - the connection goes back to the pool,
+            # so temp tables would otherwise outlive this job
+            cur.execute("DROP TABLE IF EXISTS reembed_stage;")
+            conn.commit()
+
         logger.info(f"✅ Re-embedding complete: {processed} processed, {skipped} skipped, {errors} errors")
         
     except Exception as e:
         logger.error(f"❌ Re-embedding job failed: {str(e)}")
         conn.rollback()
     finally:
+        if ann_index_def:
+            # Rebuild the ANN index even if the job failed partway - leaving
+            # it dropped would silently disable ANN search on this table
+            try:
+                logger.info(f"🔨 Rebuilding ANN index {ann_index_name} on {table_name}")
+                conn.autocommit = True
+                cur.execute(ann_index_def)
+                conn.autocommit = False
+                logger.info(f"✅ ANN index {ann_index_name} rebuilt")
+            except Exception as e:
+                logger.error(f"❌ Failed to rebuild ANN index {ann_index_name}: {str(e)} - definition: {ann_index_def}")
+        try:
+            # Connection goes back to the pool - don't leak the prepared statement
+            cur.execute("DEALLOCATE reembed_state_update;")
+            conn.commit()
+        except Exception:
+            pass  # never prepared (early return) or connection already broken
+        try:
+            read_cur.close()
+        except Exception:
+            pass  # named cursor may already be exhausted/closed
+        read_conn.close()
         cur.close()
         conn.close()
 
@@ -435,35 +821,44 @@ async def generate_embeddings_handler(request_body: dict) -> dict:
     if isinstance(force, str):
         force = force.lower() in ("true", "1", "yes")
     
-    # Create client to detect dimensions
-    client = OpenAI(
-        base_url=embedding_url,
-        api_key=embedding_api_key or "not-needed",
-    )
-    
-    # Detect/validate embedding dimensions
-    # This will FAIL if embedding_dims is set but model doesn't return matching dimensions
-    dims = _detect_embedding_dimensions(client, embedding_model, embedding_dims)
+    if embedding_dims is not None:
+        # Caller told us the dimensions - skip the eager test request.
+        # The worker validates the first real batch and aborts on mismatch,
+        # so a wrong value still fails loudly without costing an extra RTT here.
+        dims = embedding_dims
+    else:
+        # Shared (cached) client for dimension detection
+        client = _get_openai_client(embedding_url, embedding_api_key or "not-needed")
+        # Detection does a blocking HTTP request - run it off the event loop
+        # so concurrent handlers aren't serialized behind it
+        dims = await asyncio.to_thread(_detect_embedding_dimensions, client, embedding_model)
     table_name = f"memory_{dims}"
-    
-    # Ensure embedding table exists
-    if not table_exists(table_name):
+
+    # Ensure embedding table exists (blocking DB calls off the event loop)
+    if not await asyncio.to_thread(table_exists, table_name):
         logger.info(f"📦 Creating new embedding table: {table_name}")
-        create_embedding_table(dims)
-    
-    # If force=true, delete existing embeddings first (synchronously before starting re-embed)
+        await asyncio.to_thread(create_embedding_table, dims)
+
+    # If force=true, delete existing embeddings first (before starting re-embed)
     if force:
         logger.info(f"🔄 Force mode: deleting existing embeddings for model '{embedding_model}' before re-embedding")
-        # Run deletion synchronously so re-embedding sees clean state
-        _do_delete_embeddings(embedding_model, namespace)
-    
-    # Start background thread (pass embedding_dims for consistent generation)
-    thread = threading.Thread(
+        # Run deletion to completion so re-embedding sees clean state,
+        # but on a worker thread so the event loop stays responsive
+        await asyncio.to_thread(_do_delete_embeddings, embedding_model, namespace)
+    
+    # Run the worker in its own process rather than a thread: a large
+    # re-embed run accumulates hundreds of MB of transient Python objects
+    # (content strings, embedding lists), and CPython rarely returns that
+    # arena memory to the OS while the long-lived server process holds it.
+    # A child process gives it all back on exit. "spawn" (not fork) so the
+    # child gets fresh DB connections instead of inheriting pooled sockets.
+    ctx = multiprocessing.get_context("spawn")
+    process = ctx.Process(
         target=_do_reembedding,
         args=(embedding_url, embedding_model, embedding_api_key, namespace, dims, table_name, embedding_dims),
         daemon=True,
     )
-    thread.start()
+    process.start()
     
     # Display-friendly namespace for response
     namespace_display = namespace if namespace else "(all namespaces)"
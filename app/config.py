@@ -1,8 +1,9 @@
 
 import os
 import logging
+from functools import lru_cache
 from dotenv import load_dotenv
-from zoneinfo import ZoneInfo, available_timezones
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 # Load environment variables from .env file
 load_dotenv()
@@ -17,6 +18,28 @@ POSTGRES_USER = os.getenv("POSTGRES_USER", "postgres")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "postgres")
 POSTGRES_DB = os.getenv("POSTGRES_DB", "memory")
 
+# Upper bound on pooled database connections per process. Size against the
+# server's max_connections budget when running many workers.
+POOL_SIZE = int(os.getenv("POOL_SIZE", 32))
+
+# plan_cache_mode for pooled connections (PostgreSQL 12+). Prepared
+# statements switch to a generic plan after five executions, which can
+# regress badly on JSONB- and index-sensitive queries; force_custom_plan
+# keeps planning per-call with parameter values visible. Set empty to
+# leave the server default.
+POSTGRES_PLAN_CACHE_MODE = os.getenv("POSTGRES_PLAN_CACHE_MODE", "force_custom_plan").strip().lower()
+
+# TCP keepalive tuning for pooled connections. Long-idle connections behind
+# NATs/load balancers can die silently; without keepalives the next borrow
+# hangs until the kernel gives up. Probes start after IDLE seconds of
+# silence, repeat every INTERVAL seconds, and the connection is declared
+# dead after COUNT failed probes. TCP_USER_TIMEOUT (ms, Linux) additionally
+# bounds how long unacknowledged sends may linger; 0 leaves the OS default.
+POSTGRES_KEEPALIVES_IDLE = int(os.getenv("POSTGRES_KEEPALIVES_IDLE", 30))
+POSTGRES_KEEPALIVES_INTERVAL = int(os.getenv("POSTGRES_KEEPALIVES_INTERVAL", 10))
+POSTGRES_KEEPALIVES_COUNT = int(os.getenv("POSTGRES_KEEPALIVES_COUNT", 3))
+POSTGRES_TCP_USER_TIMEOUT = int(os.getenv("POSTGRES_TCP_USER_TIMEOUT", 30000))
+
 # Embedding Configuration
 EMBEDDING_URL = os.getenv("EMBEDDING_URL")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL")
@@ -28,6 +51,55 @@ EMBEDDING_API_KEY = os.getenv("EMBEDDING_API_KEY")
 _embedding_dims_raw = os.getenv("EMBEDDING_DIMS", "").strip()
 EMBEDDING_DIMS = int(_embedding_dims_raw) if _embedding_dims_raw else None
 
+# Re-embedding batch size: how many memories are sent per embeddings API call
+# during background re-embedding jobs (POST /api/embeddings/generate)
+REEMBED_BATCH_SIZE = int(os.getenv("REEMBED_BATCH_SIZE", 64))
+
+# How many embedding API calls are in flight concurrently during re-embedding
+# (embedding generation is network-bound, so parallel requests hide latency)
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 16))
+
+# How long detected embedding dimensions are cached per (url, model, dims)
+# before a fresh test request is made - default 1 hour
+EMBEDDING_DIMS_CACHE_TTL = int(os.getenv("EMBEDDING_DIMS_CACHE_TTL", 3600))
+
+# If true and the embedding endpoint is local, re-embedding loads the model
+# directly via the optional fastembed package (ONNX) instead of going through
+# HTTP - skips TLS/JSON overhead entirely. Requires `pip install fastembed`;
+# falls back to the HTTP endpoint if the package or model isn't available.
+EMBEDDING_NATIVE = os.getenv("EMBEDDING_NATIVE", "false").lower() == "true"
+
+# If true, embedding tables store vectors as halfvec (16-bit floats,
+# pgvector 0.7+) instead of vector (32-bit) - halves disk, WAL and index
+# size with negligible recall loss. Existing tables are converted in place
+# on startup (column retyped, ANN index rebuilt with halfvec ops) and all
+# query/insert paths cast their parameters to the configured type.
+USE_HALFVEC = os.getenv("USE_HALFVEC", "false").lower() == "true"
+
+# ANN index type for embedding tables: "hnsw" (default, best QPS/recall)
+# or "ivfflat" (faster to build, needs tuning, degrades on updates).
+# Parameters (hnsw m/ef_construction, ivfflat lists) are auto-sized from
+# the table's row count at index-creation time.
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw").lower()
+
+# Optional explicit HNSW build parameters. When unset, m/ef_construction
+# are auto-sized from the table's row count; set these to pin values for
+# workloads where the tiers are wrong (e.g. very high-dimensional models)
+_hnsw_m_raw = os.getenv("HNSW_M", "").strip()
+HNSW_M = int(_hnsw_m_raw) if _hnsw_m_raw else None
+_hnsw_efc_raw = os.getenv("HNSW_EF_CONSTRUCTION", "").strip()
+HNSW_EF_CONSTRUCTION = int(_hnsw_efc_raw) if _hnsw_efc_raw else None
+
+# maintenance_work_mem applied for ANN index builds (table creation and the
+# ivfflat→HNSW migration). HNSW build time is dominated by how much of the
+# graph fits in memory; size this to what the host can spare per build.
+MAINTENANCE_WORK_MEM = os.getenv("MAINTENANCE_WORK_MEM", "2GB")
+
+# If true, large re-embed jobs (>50k memories) drop the ANN index before
+# bulk-inserting and rebuild it afterwards - much faster overall, but ANN
+# search on that table degrades to sequential scan while the job runs
+REEMBED_DROP_INDEX = os.getenv("REEMBED_DROP_INDEX", "false").lower() == "true"
+
 # MCP Configuration
 BEARER_TOKEN = os.getenv("BEARER_TOKEN")
 NAMESPACE = os.getenv("NAMESPACE")
@@ -37,6 +109,12 @@ NAMESPACE = os.getenv("NAMESPACE")
 # If not set, /api/* endpoints return 404
 API_BEARER_TOKEN = os.getenv("API_BEARER_TOKEN")
 
+# TOAST storage strategy for memories.content: "default" keeps Postgres'
+# EXTENDED (compress, then move out-of-line), "external" skips compression
+# entirely - better for large or already-compressed/encrypted content where
+# compression wastes CPU and blocks partial reads
+CONTENT_STORAGE = os.getenv("CONTENT_STORAGE", "default").lower()
+
 # Encryption Configuration
 # If set and non-empty, all new memories will be encrypted with AES-256-GCM
 # If empty or not set, memories are stored as plain UTF-8 (enc=false)
@@ -74,28 +152,39 @@ OAUTH_REDIRECT_URIS = os.getenv(
 #   - Valid timezone string (e.g., Australia/Adelaide, America/New_York, Europe/London)
 #   - UTC (default if not set or invalid)
 #   - false (disables timezone feature entirely - no current_time or timezone fields in responses)
+@lru_cache(maxsize=1)
 def _parse_timezone_config():
-    """Parse and validate TIMEZONE configuration."""
+    """
+    Parse and validate TIMEZONE configuration.
+
+    Cached so re-imports (e.g. from a test harness) don't re-run it.
+    Validation just tries ZoneInfo() directly - catching
+    ZoneInfoNotFoundError is cheaper than materializing the full
+    available_timezones() set only to do a membership check.
+    """
     tz_value = os.getenv("TIMEZONE", "").strip()
-    
+
     # Check for "false" (case-insensitive) - disable feature entirely
     if tz_value.lower() == "false":
         config_logger.info("⏰ Timezone feature disabled (TIMEZONE=false)")
         return None, True  # None timezone, feature disabled
-    
+
     # Empty string or not set - default to UTC
     if not tz_value:
         config_logger.info("⏰ Timezone defaulting to UTC (TIMEZONE not set)")
         return ZoneInfo("UTC"), False
-    
+
     # Try to parse as valid timezone
-    if tz_value in available_timezones():
+    try:
+        tz = ZoneInfo(tz_value)
         config_logger.info(f"⏰ Timezone configured: {tz_value}")
-        return ZoneInfo(tz_value), False
-    
-    # Invalid timezone - warn and fall back to UTC
-    config_logger.warning(f"⚠️ Invalid timezone '{tz_value}', falling back to UTC")
-    return ZoneInfo("UTC"), False
+        return tz, False
+    except (ZoneInfoNotFoundError, ValueError):
+        # Invalid timezone - warn and fall back to UTC. ZoneInfo raises
+        # ValueError (not ZoneInfoNotFoundError) for malformed keys such
+        # as path traversals, and those must fall back too, not crash.
+        config_logger.warning(f"⚠️ Invalid timezone '{tz_value}', falling back to UTC")
+        return ZoneInfo("UTC"), False
 
 # Parse timezone on startup
 TIMEZONE, TIMEZONE_DISABLED = _parse_timezone_config()
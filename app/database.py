@@ -17,89 +17,445 @@ V5 Schema:
 
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
+from psycopg2 import sql
 import logging
 import hashlib
+import os
+import tempfile
+import threading
 import time
+import weakref
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
 from typing import Optional, Any
-from app.config import POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER, POSTGRES_PASSWORD, POSTGRES_DB
+from app.config import (
+    POSTGRES_HOST,
+    POSTGRES_PORT,
+    POSTGRES_USER,
+    POSTGRES_PASSWORD,
+    POSTGRES_DB,
+    POOL_SIZE,
+    POSTGRES_PLAN_CACHE_MODE,
+    POSTGRES_KEEPALIVES_IDLE,
+    POSTGRES_KEEPALIVES_INTERVAL,
+    POSTGRES_KEEPALIVES_COUNT,
+    POSTGRES_TCP_USER_TIMEOUT,
+    USE_HALFVEC,
+    VECTOR_INDEX_TYPE,
+    CONTENT_STORAGE,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    MAINTENANCE_WORK_MEM,
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# JSON parameter adapter: stdlib json.dumps is pure Python and shows up on
+# the hot write paths (state updates, system-state upserts). When the
+# optional orjson package is installed it takes over transparently - like
+# fastembed for embeddings, it's an accelerator, not a requirement.
+try:
+    import orjson
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+
+    class Json(psycopg2.extras.Json):
+        """psycopg2 Json adapter that serializes via orjson."""
+
+        def dumps(self, obj):
+            return orjson.dumps(obj).decode()
+except ImportError:
+    from json import dumps as _json_dumps
+
+    Json = psycopg2.extras.Json
+
+# Shared connection pool - created lazily on first use so importing this
+# module doesn't require a reachable database
+_pool: Optional[psycopg2.pool.ThreadedConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> psycopg2.pool.ThreadedConnectionPool:
+    """Get the shared connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Keepalives so a connection silently dropped by a NAT or
+                # load balancer is detected instead of hanging the next borrow
+                kwargs = {
+                    "keepalives": 1,
+                    "keepalives_idle": POSTGRES_KEEPALIVES_IDLE,
+                    "keepalives_interval": POSTGRES_KEEPALIVES_INTERVAL,
+                    "keepalives_count": POSTGRES_KEEPALIVES_COUNT,
+                }
+                if POSTGRES_TCP_USER_TIMEOUT:
+                    kwargs["tcp_user_timeout"] = POSTGRES_TCP_USER_TIMEOUT
+                if POSTGRES_PLAN_CACHE_MODE:
+                    # Applied at connect time so every pooled connection -
+                    # and thus every prepared hot statement - gets it
+                    kwargs["options"] = f"-c plan_cache_mode={POSTGRES_PLAN_CACHE_MODE}"
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    minconn=2,
+                    maxconn=max(2, POOL_SIZE),
+                    host=POSTGRES_HOST,
+                    port=POSTGRES_PORT,
+                    user=POSTGRES_USER,
+                    password=POSTGRES_PASSWORD,
+                    database=POSTGRES_DB,
+                    **kwargs
+                )
+                logger.info(f"🔌 Database connection pool created (2-{max(2, POOL_SIZE)} connections)")
+    return _pool
+
+
+def close_pool() -> None:
+    """
+    Close all pooled connections (call on process shutdown).
+
+    Safe to call when the pool was never created; a later borrow would
+    lazily create a fresh pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            logger.info("🔌 Database connection pool closed")
+
+
+class _PooledConnection:
+    """
+    Thin proxy around a pooled psycopg2 connection.
+
+    Callers throughout the codebase use the get_db_connection()/conn.close()
+    pattern, so close() here returns the connection to the pool instead of
+    tearing it down - existing call sites get pooling without modification.
+    """
+    __slots__ = ("_conn", "_returned")
+
+    def __init__(self, conn):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_returned", False)
+
+    def close(self):
+        """Return the connection to the pool (putconn rolls back if needed)."""
+        if not self._returned:
+            object.__setattr__(self, "_returned", True)
+            _get_pool().putconn(self._conn)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
 
 def get_db_connection():
-    """Establishes connection to the PostgreSQL database."""
-    conn = psycopg2.connect(
-        host=POSTGRES_HOST,
-        port=POSTGRES_PORT,
-        user=POSTGRES_USER,
-        password=POSTGRES_PASSWORD,
-        database=POSTGRES_DB
-    )
-    return conn
+    """
+    Borrow a connection from the shared pool.
 
+    Returns a proxy whose close() returns the connection to the pool
+    rather than closing it, avoiding a full PostgreSQL handshake per
+    operation. Callers keep the existing connect/close pattern.
+    """
+    return _PooledConnection(_get_pool().getconn())
 
-def table_exists(table_name: str) -> bool:
-    """Check if a table exists in the database."""
-    conn = get_db_connection()
-    cur = conn.cursor()
+
+@contextmanager
+def pooled_connection():
+    """
+    Context manager that borrows a connection from the shared pool.
+
+    Usage:
+        with pooled_connection() as conn:
+            ...
+
+    The connection is returned to the pool on exit.
+    """
+    pool = _get_pool()
+    conn = pool.getconn()
     try:
-        cur.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_name = %s
-            );
-        """, (table_name,))
-        exists = cur.fetchone()[0]
-        return exists
-    finally:
-        cur.close()
-        conn.close()
+        yield conn
+    except psycopg2.Error:
+        # A driver-level error may leave the connection with a broken socket
+        # or an aborted transaction state - discard it so the pool mints a
+        # fresh one instead of recycling a poisoned connection
+        pool.putconn(conn, close=True)
+        raise
+    except Exception:
+        pool.putconn(conn, close=bool(conn.closed))
+        raise
+    else:
+        pool.putconn(conn)
+
+
+# Statements hot enough to prepare: the same SQL text is sent many times per
+# session, and psycopg2 (unlike psycopg3) never auto-prepares, so PostgreSQL
+# re-parses and re-plans on every call. These are PREPAREd once per pooled
+# connection; pooled connections are long-lived, so the plan is reused for
+# the connection's whole lifetime. Maps name -> (param types, statement).
+_HOT_STATEMENTS = {
+    "ms_update_state": (
+        "(jsonb, bigint)",
+        """UPDATE memories SET state = COALESCE(state, '{}'::jsonb) || $1
+           WHERE id = $2
+           RETURNING state->'embedding_tables'""",
+    ),
+    "ms_get_embedding_tables": (
+        "(bigint)",
+        "SELECT state->'embedding_tables' FROM memories WHERE id = $1",
+    ),
+    # Single-key fast path for set_system_state - by far its common shape
+    # (db_version bumps, service-state flips)
+    "ms_set_state": (
+        "(text, jsonb)",
+        """INSERT INTO system_state (key, value) VALUES ($1, $2)
+           ON CONFLICT (key) DO UPDATE SET
+               value = EXCLUDED.value,
+               updated_at = CURRENT_TIMESTAMP""",
+    ),
+    # $1 = table name, $2 = model name, $3 = memory ids. Built as || merges
+    # rather than nested jsonb_set: each jsonb_set materializes a fresh copy
+    # of the whole state document, while || only rebuilds the object levels
+    # it actually touches - for large state docs that halves the write cost.
+    "ms_add_embedding": (
+        "(text, text, bigint[])",
+        """UPDATE memories
+           SET state = COALESCE(state, '{}'::jsonb) || jsonb_build_object(
+               'embedding_tables',
+               COALESCE(state->'embedding_tables', '{}'::jsonb) || jsonb_build_object(
+                   $1,
+                   COALESCE(state->'embedding_tables'->$1, '[]'::jsonb) ||
+                   CASE WHEN COALESCE(state->'embedding_tables'->$1, '[]'::jsonb) ? $2
+                        THEN '[]'::jsonb
+                        ELSE jsonb_build_array($2::text)
+                   END
+               )
+           )
+           WHERE id = ANY($3)
+           RETURNING id, state->'embedding_tables'""",
+    ),
+}
+
+# Which hot statements each raw connection has prepared so far. Keyed weakly
+# so entries disappear when the pool drops a connection.
+_prepared_by_conn: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _execute_hot(conn, cur, name: str, params: tuple) -> None:
+    """
+    Execute one of _HOT_STATEMENTS via a server-side prepared statement.
+
+    The statement is PREPAREd the first time this connection runs it and
+    EXECUTEd from then on, amortizing parse/plan cost across the pooled
+    connection's lifetime.
+    """
+    raw = getattr(conn, "_conn", conn)
+    prepared = _prepared_by_conn.get(raw)
+    if prepared is None:
+        prepared = set()
+        _prepared_by_conn[raw] = prepared
+    if name not in prepared:
+        arg_types, sql = _HOT_STATEMENTS[name]
+        cur.execute(f"PREPARE {name} {arg_types} AS {sql};")
+        prepared.add(name)
+    placeholders = ", ".join(["%s"] * len(params))
+    cur.execute(f"EXECUTE {name} ({placeholders});", params)
+
+
+# Cached list of memory_{dims} tables (tuple, or None when not yet probed).
+# Schema lookups hit information_schema, which can take seconds on busy
+# servers, and the answers only change when WE create tables - so results
+# are cached per-process and invalidated by the create_* functions.
+_EXISTING_TABLES_CACHE: Optional[tuple[str, ...]] = None
+
+# Tables confirmed to exist. Only positive answers are cached: a table that
+# exists stays existing for this process's purposes, but a missing table may
+# be created at any moment by another worker, so "no" is always re-checked.
+_known_tables: set[str] = set()
+
+
+def _invalidate_schema_cache() -> None:
+    """Drop cached schema lookups after DDL that changes the answer."""
+    global _EXISTING_TABLES_CACHE
+    _EXISTING_TABLES_CACHE = None
+    _known_tables.clear()
+
+
+def table_exists(table_name: str) -> bool:
+    """
+    Check if a table exists in the database.
+
+    Positive results are cached per-process; the create_* functions
+    invalidate via _invalidate_schema_cache() when they change the schema.
+    """
+    if table_name in _known_tables:
+        return True
+
+    with pooled_connection() as conn, conn.cursor() as cur:
+        # to_regclass is a single pg_class lookup; the information_schema
+        # view it replaces joins several catalogs and applies ACL filtering
+        cur.execute("SELECT to_regclass(%s);", (f'public.{table_name}',))
+        exists = cur.fetchone()[0] is not None
+
+    if exists:
+        _known_tables.add(table_name)
+    return exists
 
 
 def get_existing_embedding_tables() -> list[str]:
-    """Find all existing memory_{dims} tables in the database."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    """Find all existing memory_{dims} tables in the database (cached)."""
+    global _EXISTING_TABLES_CACHE
+    if _EXISTING_TABLES_CACHE is not None:
+        return list(_EXISTING_TABLES_CACHE)
+
+    with pooled_connection() as conn, conn.cursor() as cur:
+        # Aggregate server-side: one row and one text[] (psycopg2 converts
+        # it to a list directly) instead of N tuples through libpq
         cur.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_name LIKE 'memory_%'
-            AND table_name != 'memories';
+            SELECT COALESCE(array_agg(relname ORDER BY relname), '{}')
+            FROM pg_class
+            WHERE relkind = 'r'
+            AND relnamespace = 'public'::regnamespace
+            AND relname LIKE 'memory_%'
+            AND relname != 'memories'
+            AND relname NOT LIKE '%\_v1\_old';
         """)
-        tables = [row[0] for row in cur.fetchall()]
+        tables = cur.fetchone()[0]
+        _EXISTING_TABLES_CACHE = tuple(tables)
         return tables
-    finally:
-        cur.close()
-        conn.close()
 
 
-def get_system_state() -> Optional[dict]:
+def introspect_schema() -> dict:
+    """
+    Fetch everything startup/migrations need to know about the schema in a
+    single round-trip instead of a cascade of per-table probes.
+
+    Returns:
+        Dict with:
+        - memories_exists: whether the memories table exists
+        - system_state_exists: whether the system_state table exists
+        - embedding_tables: list of memory_{dims} table names
+        - v1_tables: subset of embedding_tables that still carry a
+          content column (i.e. pre-split V1 schema)
+
+    The result also seeds the table_exists / get_existing_embedding_tables
+    caches, so the table_exists() calls that follow startup introspection
+    are answered without touching the database again.
+    """
+    global _EXISTING_TABLES_CACHE
+    with pooled_connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            WITH t AS (
+                SELECT table_name
+                FROM information_schema.tables
+                WHERE table_schema = 'public'
+            ),
+            c AS (
+                SELECT table_name
+                FROM information_schema.columns
+                WHERE table_schema = 'public'
+                AND column_name = 'content'
+            )
+            SELECT json_build_object(
+                'memories_exists',
+                    EXISTS (SELECT 1 FROM t WHERE table_name = 'memories'),
+                'system_state_exists',
+                    EXISTS (SELECT 1 FROM t WHERE table_name = 'system_state'),
+                'embedding_tables', COALESCE((
+                    SELECT json_agg(table_name ORDER BY table_name)
+                    FROM t
+                    WHERE table_name LIKE 'memory_%'
+                    AND table_name != 'memories'
+                    AND table_name NOT LIKE '%\_v1\_old'
+                ), '[]'::json),
+                'v1_tables', COALESCE((
+                    SELECT json_agg(t.table_name ORDER BY t.table_name)
+                    FROM t JOIN c USING (table_name)
+                    WHERE t.table_name LIKE 'memory_%'
+                    AND t.table_name != 'memories'
+                    AND t.table_name NOT LIKE '%\_v1\_old'
+                ), '[]'::json)
+            );
+        """)
+        schema = cur.fetchone()[0]
+
+    # Seed the schema caches from the one probe we just paid for
+    _EXISTING_TABLES_CACHE = tuple(schema['embedding_tables'])
+    _known_tables.update(schema['embedding_tables'])
+    if schema['memories_exists']:
+        _known_tables.add('memories')
+    if schema['system_state_exists']:
+        _known_tables.add('system_state')
+    return schema
+
+
+# Single-slot cache for the system_state row set. The row only changes when
+# set_system_state runs in this process, so after the first read every
+# db_version/service_state check is a dict lookup instead of a round-trip.
+_SYSTEM_STATE_CACHE: Optional[dict] = None
+# Memoized result of the V4-vs-V5 schema probe: the table's shape only
+# changes via the v4_to_v5 migration, so probing information_schema on
+# every cold read is wasted round-trips
+_SYSTEM_STATE_IS_V5: Optional[bool] = None
+_system_state_lock = threading.Lock()
+
+
+def _invalidate_system_state_cache() -> None:
+    """Drop the cached system state (call after out-of-band schema changes)."""
+    global _SYSTEM_STATE_CACHE, _SYSTEM_STATE_IS_V5
+    with _system_state_lock:
+        _SYSTEM_STATE_CACHE = None
+        _SYSTEM_STATE_IS_V5 = None
+
+
+def get_system_state(conn=None) -> Optional[dict]:
     """
     Get the system state as a dictionary from the key-value table.
-    
+
     V5 Schema: key-value pairs are returned as a dict.
     For backwards compatibility during migration, also handles V4 fixed-column schema.
-    
+
+    Cached per process: set_system_state refreshes the cache on every write,
+    so repeat reads skip the database entirely.
+
+    Args:
+        conn: Optional open connection to reuse; borrows from the pool when omitted
+
     Returns:
         Dict with system state values, or None if table doesn't exist
     """
+    global _SYSTEM_STATE_CACHE
+    with _system_state_lock:
+        if _SYSTEM_STATE_CACHE is not None:
+            return dict(_SYSTEM_STATE_CACHE)
+
     if not table_exists('system_state'):
         return None
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # Check if this is V5 schema (has 'key' column) or V4 schema (has 'db_version' column)
-        cur.execute("""
-            SELECT column_name FROM information_schema.columns 
-            WHERE table_name = 'system_state' AND column_name = 'key';
-        """)
-        is_v5_schema = cur.fetchone() is not None
-        
+
+    global _SYSTEM_STATE_IS_V5
+    with (pooled_connection() if conn is None else nullcontext(conn)) as conn, conn.cursor() as cur:
+        # Check if this is V5 schema (has 'key' column) or V4 schema (has
+        # 'db_version' column) - memoized; the v4_to_v5 migration invalidates.
+        # Probes pg_attribute directly: the information_schema view layers
+        # visibility and privilege joins over the same catalog row.
+        if _SYSTEM_STATE_IS_V5 is None:
+            cur.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_attribute
+                    WHERE attrelid = to_regclass('public.system_state')
+                    AND attname = 'key'
+                    AND NOT attisdropped
+                );
+            """)
+            with _system_state_lock:
+                _SYSTEM_STATE_IS_V5 = cur.fetchone()[0]
+        is_v5_schema = _SYSTEM_STATE_IS_V5
+
         if is_v5_schema:
             # V5 key-value schema
             cur.execute("SELECT key, value FROM system_state;")
@@ -109,69 +465,90 @@ def get_system_state() -> Optional[dict]:
             result = {}
             for key, value in rows:
                 result[key] = value
-            return result
         else:
             # V4 fixed-column schema (for backwards compatibility during migration)
             cur.execute("SELECT * FROM system_state WHERE id = 1;")
             columns = [desc[0] for desc in cur.description]
             row = cur.fetchone()
-            if row:
-                return dict(zip(columns, row))
-            return None
-    finally:
-        cur.close()
-        conn.close()
+            if row is None:
+                return None
+            result = dict(zip(columns, row))
+
+    # Only successful reads are cached: a missing table or empty row set is
+    # transient during install/migration and must stay a live probe
+    with _system_state_lock:
+        _SYSTEM_STATE_CACHE = dict(result)
+    return result
 
 
-def set_system_state(db_version: int = None, **kwargs) -> None:
+def set_system_state(db_version: int = None, conn=None, **kwargs) -> None:
     """
     Update system state key-value pairs.
-    
+
     V5 Schema: each parameter becomes a key-value pair.
-    
+
     Args:
         db_version: Database version (special case for compatibility)
+        conn: Optional open connection to reuse; borrows from the pool when omitted
         **kwargs: Any additional key-value pairs to upsert
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # Collect all key-value pairs to upsert
-        updates = {}
-        if db_version is not None:
-            updates['db_version'] = db_version
-        updates.update(kwargs)
-        
-        for key, value in updates.items():
-            cur.execute("""
-                INSERT INTO system_state (key, value) 
-                VALUES (%s, %s)
-                ON CONFLICT (key) DO UPDATE SET 
+    # Collect all key-value pairs to upsert
+    updates = {}
+    if db_version is not None:
+        updates['db_version'] = db_version
+    updates.update(kwargs)
+    if not updates:
+        return
+
+    with (pooled_connection() if conn is None else nullcontext(conn)) as conn, conn.cursor() as cur:
+        if len(updates) == 1:
+            # Single-key writes (the common case) go through the prepared
+            # statement so repeat calls skip parse+plan entirely
+            key, value = next(iter(updates.items()))
+            # Pre-serialized text: the prepared statement's $2 is typed
+            # jsonb, so the literal coerces server-side and the driver skips
+            # the per-call Json adapter dispatch
+            _execute_hot(conn, cur, "ms_set_state", (key, _json_dumps(value)))
+        else:
+            # One multi-row upsert: a single round-trip regardless of how
+            # many keys are written, and concurrent writers to different
+            # keys merge instead of racing a per-key loop
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO system_state (key, value)
+                VALUES %s
+                ON CONFLICT (key) DO UPDATE SET
                     value = EXCLUDED.value,
                     updated_at = CURRENT_TIMESTAMP;
-            """, (key, psycopg2.extras.Json(value)))
-        
+            """, [(key, _json_dumps(value)) for key, value in updates.items()])
+
         conn.commit()
-    finally:
-        cur.close()
-        conn.close()
 
+    # Fold the committed writes into the process-local cache so readers see
+    # them without another round-trip
+    global _SYSTEM_STATE_CACHE
+    with _system_state_lock:
+        if _SYSTEM_STATE_CACHE is not None:
+            _SYSTEM_STATE_CACHE.update(updates)
 
-def create_system_state_table() -> None:
+
+def create_system_state_table(conn=None) -> None:
     """
     Create the V5 key-value system_state table.
-    
+
     V5 Schema:
     - id: SERIAL PRIMARY KEY
     - key: TEXT UNIQUE NOT NULL (the setting name)
     - value: JSONB NOT NULL (the setting value)
     - created_at/updated_at: timestamps
+
+    Args:
+        conn: Optional open connection to reuse (callers running several
+            DDL helpers back-to-back avoid churning pool slots); borrows
+            from the pool when omitted
     """
     from app.migrations.runner import CURRENT_DB_VERSION
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+
+    with (pooled_connection() if conn is None else nullcontext(conn)) as conn, conn.cursor() as cur:
         cur.execute("""
             CREATE TABLE IF NOT EXISTS system_state (
                 id SERIAL PRIMARY KEY,
@@ -187,20 +564,28 @@ def create_system_state_table() -> None:
             INSERT INTO system_state (key, value) 
             VALUES ('db_version', %s)
             ON CONFLICT (key) DO NOTHING;
-        """, (psycopg2.extras.Json(CURRENT_DB_VERSION),))
+        """, (Json(CURRENT_DB_VERSION),))
         
         conn.commit()
+        _invalidate_schema_cache()
+        _invalidate_system_state_cache()
         logger.info("✅ Created V5 system_state table")
-    finally:
-        cur.close()
-        conn.close()
 
 
-def create_memories_table() -> None:
-    """Create the main memories table (source of truth) with V6 schema."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+def create_memories_table(conn=None) -> None:
+    """
+    Create the main memories table (source of truth) with V6 schema.
+
+    The content column's TOAST compression is switched to lz4 on PG14+
+    (3-5x faster than pglz at similar ratios; decompression sits on the
+    cold-read path of every retrieve). With CONTENT_STORAGE=external the
+    column skips compression entirely - the right trade for mostly large
+    or encrypted content, at the cost of more disk for compressible text.
+
+    Args:
+        conn: Optional open connection to reuse; borrows from the pool when omitted
+    """
+    with (pooled_connection() if conn is None else nullcontext(conn)) as conn, conn.cursor() as cur:
         cur.execute("""
             CREATE TABLE IF NOT EXISTS memories (
                 id BIGSERIAL PRIMARY KEY,
@@ -221,9 +606,11 @@ def create_memories_table() -> None:
             ON memories(namespace);
         """)
         
+        # jsonb_path_ops: several times smaller than the default jsonb_ops
+        # and faster for @> containment, the indexable labels pattern
         cur.execute("""
-            CREATE INDEX IF NOT EXISTS idx_memories_labels_gin 
-            ON memories USING GIN(labels);
+            CREATE INDEX IF NOT EXISTS idx_memories_labels_gin
+            ON memories USING GIN (labels jsonb_path_ops);
         """)
         
         cur.execute("""
@@ -238,22 +625,41 @@ def create_memories_table() -> None:
         
         # V6: Index for efficient MAX(content_id) queries per namespace
         cur.execute("""
-            CREATE INDEX IF NOT EXISTS idx_memories_namespace_content_id 
+            CREATE INDEX IF NOT EXISTS idx_memories_namespace_content_id
             ON memories(namespace, content_id DESC);
         """)
-        
+
+        # TOAST strategy for content (see docstring). SET COMPRESSION only
+        # affects newly written values, so it's safe on existing tables.
+        # lz4 needs PG 14+ AND a server compiled --with-lz4; the version
+        # number can't tell us about the build flag, so try the ALTER under
+        # a savepoint and fall back to the default pglz when it's missing.
+        cur.execute("SHOW server_version_num;")
+        server_version = int(cur.fetchone()[0])
+        if server_version >= 140000:
+            cur.execute("SAVEPOINT try_lz4;")
+            try:
+                cur.execute("ALTER TABLE memories ALTER COLUMN content SET COMPRESSION lz4;")
+                cur.execute("RELEASE SAVEPOINT try_lz4;")
+            except psycopg2.Error as e:
+                cur.execute("ROLLBACK TO SAVEPOINT try_lz4;")
+                logger.warning(f"⚠️ lz4 TOAST compression unavailable, keeping pglz: {e}")
+        if CONTENT_STORAGE == 'external':
+            cur.execute("ALTER TABLE memories ALTER COLUMN content SET STORAGE EXTERNAL;")
+
         conn.commit()
+        _invalidate_schema_cache()
         logger.info("✅ Created memories table with indexes (V6 schema)")
-    finally:
-        cur.close()
-        conn.close()
 
 
-def create_label_tokens_table() -> None:
-    """Create the label_tokens table for trending labels feature (V7 schema)."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+def create_label_tokens_table(conn=None) -> None:
+    """
+    Create the label_tokens table for trending labels feature (V7 schema).
+
+    Args:
+        conn: Optional open connection to reuse; borrows from the pool when omitted
+    """
+    with (pooled_connection() if conn is None else nullcontext(conn)) as conn, conn.cursor() as cur:
         cur.execute("""
             CREATE TABLE IF NOT EXISTS label_tokens (
                 namespace VARCHAR(100) DEFAULT 'default',
@@ -278,111 +684,451 @@ def create_label_tokens_table() -> None:
         """)
         
         conn.commit()
+        _invalidate_schema_cache()
         logger.info("✅ Created label_tokens table with indexes (V7 schema)")
-    finally:
-        cur.close()
-        conn.close()
 
 
-def create_embedding_table(embedding_dim: int) -> None:
-    """Create an embedding table for a specific dimension (V2 schema with foreign key)."""
+# Precompiled once at import: the embedding-table DDL with the table name
+# bound via sql.Identifier (always quoted server-side) instead of an f-string
+# rebuilt per call
+_CREATE_EMBEDDING_TABLE_TPL = sql.SQL("""
+    CREATE {persistence}TABLE IF NOT EXISTS {table} (
+        id BIGSERIAL PRIMARY KEY,
+        memory_id BIGINT NOT NULL REFERENCES memories(id) ON DELETE CASCADE,
+        embedding {vector_type}({dim}) NOT NULL,
+        namespace VARCHAR(100) NOT NULL,
+        embedding_model VARCHAR(255) NOT NULL,
+        UNIQUE(memory_id, embedding_model)
+    );
+""")
+
+
+@lru_cache(maxsize=16)
+def _embedding_table_ddl(embedding_dim: int, unlogged: bool) -> sql.Composed:
+    """
+    Render the CREATE TABLE statement for one dimension, memoized.
+
+    A process only ever works with one or two dimensions, so the same
+    Composed object (and therefore the same statement text) is reused on
+    every call instead of being re-formatted.
+    """
+    # halfvec (16-bit) halves storage and index size vs vector (32-bit);
+    # query-time casts are implicit so only DDL and inserts care about the type
+    vector_type = "HALFVEC" if USE_HALFVEC else "VECTOR"
+    return _CREATE_EMBEDDING_TABLE_TPL.format(
+        persistence=sql.SQL("UNLOGGED " if unlogged else ""),
+        table=sql.Identifier(f"memory_{embedding_dim}"),
+        vector_type=sql.SQL(vector_type),
+        dim=sql.Literal(embedding_dim),
+    )
+
+
+@lru_cache(maxsize=16)
+def _btree_index_clauses(embedding_dim: int) -> tuple[tuple[str, str], ...]:
+    """The static (name, clause) pairs for a dimension's btree indexes."""
     table_name = f"memory_{embedding_dim}"
-    conn = get_db_connection()
-    cur = conn.cursor()
+    return (
+        (f"idx_namespace_{embedding_dim}", f"ON {table_name}(namespace)"),
+        (f"idx_model_{embedding_dim}", f"ON {table_name}(embedding_model)"),
+        (f"idx_memory_id_{embedding_dim}", f"ON {table_name}(memory_id)"),
+    )
+
+
+def configure_hnsw_params(row_count: int) -> dict:
+    """
+    Size HNSW build parameters from the table's row count.
+
+    Larger graphs need more neighbors per node (m) and a bigger candidate
+    list during construction (ef_construction) to hold recall; small tables
+    don't, and the defaults just slow the build down. HNSW_M and
+    HNSW_EF_CONSTRUCTION env vars pin either value explicitly for workloads
+    where the tiers are wrong.
+
+    Args:
+        row_count: Approximate number of rows in the table
+
+    Returns:
+        Dict with 'm' and 'ef_construction'
+    """
+    if row_count < 100_000:
+        params = {'m': 16, 'ef_construction': 64}
+    elif row_count <= 1_000_000:
+        params = {'m': 24, 'ef_construction': 100}
+    else:
+        params = {'m': 32, 'ef_construction': 128}
+
+    if HNSW_M is not None:
+        params['m'] = HNSW_M
+    if HNSW_EF_CONSTRUCTION is not None:
+        params['ef_construction'] = HNSW_EF_CONSTRUCTION
+    return params
+
+
+def _ann_index_clause(vector_ops: str, row_count: int) -> str:
+    """
+    Build the USING ... WITH (...) clause for the ANN index, honoring
+    VECTOR_INDEX_TYPE and auto-sizing parameters from row_count.
+    """
+    if VECTOR_INDEX_TYPE == 'ivfflat':
+        # Rule of thumb: lists ~= sqrt(rows), floor of 100
+        lists = max(100, int(row_count ** 0.5))
+        return f"USING ivfflat (embedding {vector_ops}) WITH (lists = {lists})"
+
+    params = configure_hnsw_params(row_count)
+    return (
+        f"USING hnsw (embedding {vector_ops}) "
+        f"WITH (m = {params['m']}, ef_construction = {params['ef_construction']})"
+    )
+
+
+def _maybe_convert_to_halfvec(cur, table_name: str, embedding_dim: int) -> None:
+    """
+    Convert an existing table's embedding column from vector to halfvec.
+
+    Runs when USE_HALFVEC is enabled but the table predates it. Requires
+    pgvector >= 0.7.0 (where halfvec was introduced); older versions get a
+    warning and the column is left as-is. The ANN index is dropped first so
+    it gets recreated with halfvec_cosine_ops by the caller.
+    """
+    cur.execute("""
+        SELECT format_type(atttypid, atttypmod)
+        FROM pg_attribute
+        WHERE attrelid = to_regclass(%s)
+        AND attname = 'embedding'
+        AND NOT attisdropped;
+    """, (f'public.{table_name}',))
+    row = cur.fetchone()
+    if not row or not row[0].startswith('vector'):
+        # Column missing or already halfvec - nothing to do
+        return
+
+    cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector';")
+    version_row = cur.fetchone()
     try:
+        major, minor = (int(p) for p in version_row[0].split('.')[:2])
+    except (TypeError, ValueError, IndexError):
+        major, minor = 0, 0
+    if (major, minor) < (0, 7):
+        logger.warning(
+            f"⚠️ USE_HALFVEC requires pgvector >= 0.7.0 "
+            f"(found {version_row[0] if version_row else 'none'}) - keeping vector column"
+        )
+        return
+
+    logger.info(f"🔄 Converting {table_name}.embedding to halfvec({embedding_dim})...")
+    cur.execute(f"DROP INDEX IF EXISTS idx_embedding_{embedding_dim};")
+    cur.execute(f"""
+        ALTER TABLE {table_name}
+        ALTER COLUMN embedding TYPE HALFVEC({embedding_dim})
+        USING embedding::halfvec({embedding_dim});
+    """)
+    logger.info(f"✅ Converted {table_name}.embedding to halfvec({embedding_dim})")
+
+
+def configure_search_params(conn, embedding_dim: int) -> None:
+    """
+    Tune ANN search parameters for the current transaction.
+
+    The server defaults (hnsw.ef_search=40, ivfflat.probes=1) only hold
+    recall on small tables, so this sizes them from the table's row
+    estimate. Uses SET LOCAL so the settings expire with the transaction
+    and never leak through the connection pool.
+
+    Args:
+        conn: An open connection; the caller's transaction picks up the settings
+        embedding_dim: Embedding dimension (names the memory_{dim} table)
+    """
+    table_name = f"memory_{embedding_dim}"
+    with conn.cursor() as cur:
+        cur.execute("SELECT COALESCE(reltuples::BIGINT, 0) FROM pg_class WHERE relname = %s;", (table_name,))
+        row = cur.fetchone()
+        row_count = max(0, row[0]) if row else 0
+
+        if VECTOR_INDEX_TYPE == 'ivfflat':
+            # probes ~= sqrt(lists), where lists was sized as sqrt(rows)
+            lists = max(100, int(row_count ** 0.5))
+            probes = max(10, int(lists ** 0.5))
+            cur.execute(f"SET LOCAL ivfflat.probes = {probes};")
+        else:
+            # ef_search tiers mirror the build-time m/ef_construction tiers
+            if row_count < 100_000:
+                ef_search = 40
+            elif row_count <= 1_000_000:
+                ef_search = 100
+            else:
+                ef_search = 200
+            cur.execute(f"SET LOCAL hnsw.ef_search = {ef_search};")
+
+
+def _validate_embedding_dim(embedding_dim: int) -> None:
+    """
+    Reject anything but a positive int within pgvector's supported range -
+    every memory_{dim} table/index name interpolates this value, so it's
+    validated once at each public entry point.
+    """
+    if not isinstance(embedding_dim, int) or isinstance(embedding_dim, bool) \
+            or not 0 < embedding_dim <= 16000:
+        raise ValueError(f"Invalid embedding dimension: {embedding_dim!r}")
+
+
+def create_embedding_table_plain(embedding_dim: int, unlogged: bool = False) -> None:
+    """
+    Create an embedding table without its indexes (V2 schema with foreign key).
+
+    Split out so bulk loaders (the V1 migration) can fill the table first and
+    build indexes once on the populated table via
+    create_embedding_table_indexes() - per-row index maintenance during a
+    bulk INSERT costs far more than one post-load build.
+
+    Args:
+        embedding_dim: Embedding dimension (names the memory_{dim} table)
+        unlogged: Create the table UNLOGGED so the bulk load skips WAL;
+            the loader must ALTER TABLE ... SET LOGGED when done or the
+            data won't survive a crash
+
+    Raises:
+        ValueError: if embedding_dim is invalid
+    """
+    _validate_embedding_dim(embedding_dim)
+    table_name = f"memory_{embedding_dim}"
+    with pooled_connection() as conn, conn.cursor() as cur:
         # Create the embedding table with foreign key to memories
-        cur.execute(f"""
-            CREATE TABLE IF NOT EXISTS {table_name} (
-                id BIGSERIAL PRIMARY KEY,
-                memory_id BIGINT NOT NULL REFERENCES memories(id) ON DELETE CASCADE,
-                embedding VECTOR({embedding_dim}) NOT NULL,
-                namespace VARCHAR(100) NOT NULL,
-                embedding_model VARCHAR(255) NOT NULL,
-                UNIQUE(memory_id, embedding_model)
-            );
-        """)
-        
-        # Create indexes for semantic queries (HNSW for unlimited dimensions)
-        cur.execute(f"""
-            CREATE INDEX IF NOT EXISTS idx_embedding_{embedding_dim} 
-            ON {table_name} USING hnsw (embedding vector_cosine_ops);
-        """)
-        
-        cur.execute(f"""
-            CREATE INDEX IF NOT EXISTS idx_namespace_{embedding_dim} 
-            ON {table_name}(namespace);
-        """)
-        
-        cur.execute(f"""
-            CREATE INDEX IF NOT EXISTS idx_model_{embedding_dim} 
-            ON {table_name}(embedding_model);
-        """)
-        
-        cur.execute(f"""
-            CREATE INDEX IF NOT EXISTS idx_memory_id_{embedding_dim} 
-            ON {table_name}(memory_id);
-        """)
-        
+        # (statement text memoized per dimension)
+        cur.execute(_embedding_table_ddl(embedding_dim, unlogged))
+
+        # If halfvec is enabled, upgrade tables that were created as vector
+        # (drops the ANN index so the index phase rebuilds it with halfvec ops)
+        if USE_HALFVEC:
+            _maybe_convert_to_halfvec(cur, table_name, embedding_dim)
+
         conn.commit()
-        logger.info(f"✅ Created/verified embedding table {table_name} with indexes")
-    finally:
-        cur.close()
-        conn.close()
+        _invalidate_schema_cache()
+
+
+def create_embedding_table_indexes(embedding_dim: int) -> None:
+    """
+    Build/verify the indexes for an existing embedding table.
+
+    Counterpart to create_embedding_table_plain(); create_embedding_table()
+    runs both. Only missing indexes are built, concurrently, with ANN
+    parameters sized from the table's current row estimate.
+
+    Raises:
+        ValueError: if embedding_dim is invalid
+    """
+    _validate_embedding_dim(embedding_dim)
+    table_name = f"memory_{embedding_dim}"
+    vector_ops = "halfvec_cosine_ops" if USE_HALFVEC else "vector_cosine_ops"
+    with pooled_connection() as conn, conn.cursor() as cur:
+        # Size the ANN index from the planner's row estimate - free to read
+        # and accurate enough for parameter tiers (0 on a fresh table)
+        cur.execute("SELECT COALESCE(reltuples::BIGINT, 0) FROM pg_class WHERE relname = %s;", (table_name,))
+        row = cur.fetchone()
+        row_count = max(0, row[0]) if row else 0
+
+        # Indexes: probe the catalog once and only build what's missing, so
+        # a populated table isn't rescanned four times on every startup.
+        # Validity matters: a failed CREATE INDEX CONCURRENTLY leaves an
+        # INVALID index that pg_indexes (and IF NOT EXISTS) count as
+        # present, yet the planner never uses - those must be rebuilt, not
+        # skipped, or search silently degrades to sequential scans forever.
+        wanted_indexes = {
+            # ANN index for semantic queries, type/params tuned per dataset
+            # size (row-count dependent, so not part of the memoized set)
+            f"idx_embedding_{embedding_dim}":
+                f"ON {table_name} {_ann_index_clause(vector_ops, row_count)}",
+            **dict(_btree_index_clauses(embedding_dim)),
+        }
+        cur.execute("""
+            SELECT ic.relname, i.indisvalid
+            FROM pg_index i
+            JOIN pg_class ic ON ic.oid = i.indexrelid
+            WHERE i.indrelid = to_regclass(%s);
+        """, (f'public.{table_name}',))
+        index_validity = {r[0]: r[1] for r in cur.fetchall()}
+        invalid = {name for name, valid in index_validity.items()
+                   if not valid and name in wanted_indexes}
+        missing = {name: clause for name, clause in wanted_indexes.items()
+                   if name not in index_validity or name in invalid}
+
+        if missing:
+            # CONCURRENTLY can't run inside a transaction, so flip the pooled
+            # connection to autocommit for the build and restore it after.
+            # The catalog probes above opened a transaction, and psycopg2
+            # refuses to toggle autocommit mid-transaction - end it first.
+            # Extra maintenance memory and parallel workers speed up builds
+            # on populated tables; both are session-scoped and reset below.
+            conn.rollback()
+            conn.autocommit = True
+            try:
+                cur.execute("SET maintenance_work_mem = %s;", (MAINTENANCE_WORK_MEM,))
+                cur.execute("SET max_parallel_maintenance_workers = 4;")
+                for index_name in invalid:
+                    logger.warning(
+                        f"⚠️ Dropping invalid index {index_name} "
+                        f"(leftover from a failed concurrent build)"
+                    )
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name};")
+                for index_name, clause in missing.items():
+                    cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index_name} {clause};")
+                cur.execute("RESET maintenance_work_mem;")
+                cur.execute("RESET max_parallel_maintenance_workers;")
+            finally:
+                conn.autocommit = False
+
+        # Keep rows physically ordered by memory_id: the join back to
+        # memories.id dominates cold-query I/O, and adjacency turns its
+        # random reads into dense page reads. This only records the default
+        # index - operators should run `CLUSTER {table};` after bulk
+        # reingest to actually reorder existing rows.
+        cur.execute(f"ALTER TABLE {table_name} CLUSTER ON idx_memory_id_{embedding_dim};")
+        conn.commit()
+
+
+def create_embedding_table(embedding_dim: int) -> None:
+    """
+    Create an embedding table for a specific dimension (V2 schema with
+    foreign key), indexes included.
+
+    Raises:
+        ValueError: if embedding_dim is invalid
+    """
+    create_embedding_table_plain(embedding_dim)
+    create_embedding_table_indexes(embedding_dim)
+    logger.info(f"✅ Created/verified embedding table memory_{embedding_dim} with indexes")
+
+
+def _schema_fp_path() -> str:
+    """Per-database path of the on-disk schema fingerprint file."""
+    db_key = hashlib.sha256(
+        f"{POSTGRES_HOST}:{POSTGRES_PORT}:{POSTGRES_DB}".encode()
+    ).hexdigest()[:16]
+    return os.path.join(tempfile.gettempdir(), f"memory_mcp_schema_fp_{db_key}")
 
 
 def init_database(embedding_dim: int) -> None:
     """
     Initialize the database schema.
-    
+
     This function:
     1. Ensures the vector extension is installed
     2. Runs migrations via the migrations module
     3. Creates/verifies embedding table for current dimension
+
+    Warm starts short-circuit: after a successful init the schema version is
+    fingerprinted to a temp file, and while both the file and the database
+    still report CURRENT_DB_VERSION the extension/migration machinery is
+    skipped entirely - restarting a fleet of workers against an unchanged
+    schema then costs one system_state read each instead of the full DDL
+    probe sequence. run_migrations' advisory lock already serializes the
+    cold path across processes.
     """
     # Import here to avoid circular imports
     from app.migrations import run_migrations
-    
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
+    from app.migrations.runner import CURRENT_DB_VERSION
+
+    fingerprint = f"v{CURRENT_DB_VERSION}"
+    fp_file = _schema_fp_path()
     try:
+        with open(fp_file) as f:
+            fp_matches = f.read().strip() == fingerprint
+    except OSError:
+        fp_matches = False
+
+    # In-DB sentinel: a database already at CURRENT_DB_VERSION has nothing
+    # for the extension/migration machinery to do, whether or not this host
+    # has a fingerprint file yet (fresh container against a warm database)
+    system_state = get_system_state()
+    if system_state and system_state.get('db_version') == CURRENT_DB_VERSION:
+        if not table_exists(f'memory_{embedding_dim}'):
+            create_embedding_table(embedding_dim)
+        if not fp_matches:
+            try:
+                with open(fp_file, 'w') as f:
+                    f.write(fingerprint)
+            except OSError:
+                pass
+        logger.info(f"✅ Schema up to date (warm start, embedding dim: {embedding_dim})")
+        return
+
+    with pooled_connection() as conn, conn.cursor() as cur:
         # Ensure vector extension is installed
         cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
         conn.commit()
-    finally:
-        cur.close()
-        conn.close()
-    
+
     # Run migrations (handles fresh install, V1→V2→V3→V4, and version checks)
     run_migrations(embedding_dim)
-    
+
     # Ensure embedding table for current dimension exists
     create_embedding_table(embedding_dim)
-    
+
+    # Record the fingerprint so the next start of any process on this host
+    # can take the warm path; failure to write is harmless (cold init re-runs)
+    try:
+        with open(fp_file, 'w') as f:
+            f.write(fingerprint)
+    except OSError:
+        pass
+
     logger.info(f"✅ Database initialization complete (embedding dim: {embedding_dim})")
 
 
+# Small TTL cache for get_memory_embedding_tables: retrieval post-processing
+# and delete paths look up the same ids repeatedly within a request. Entries
+# are (expiry, structure); state writers in this process invalidate their
+# ids, and the TTL bounds staleness from writes by other processes.
+_EMBED_TBL_CACHE: dict[int, tuple[float, dict]] = {}
+_EMBED_TBL_CACHE_MAX = 10_000
+_EMBED_TBL_CACHE_TTL = 60.0
+_embed_tbl_cache_lock = threading.Lock()
+
+
+def _embed_tbl_cache_get(memory_id: int) -> Optional[dict]:
+    with _embed_tbl_cache_lock:
+        entry = _EMBED_TBL_CACHE.get(memory_id)
+        if entry is None:
+            return None
+        expiry, structure = entry
+        if expiry < time.monotonic():
+            del _EMBED_TBL_CACHE[memory_id]
+            return None
+        return structure
+
+
+def _embed_tbl_cache_put(memory_id: int, structure: dict) -> None:
+    with _embed_tbl_cache_lock:
+        if len(_EMBED_TBL_CACHE) >= _EMBED_TBL_CACHE_MAX:
+            # Evict the oldest insertion - dicts iterate in insertion order
+            _EMBED_TBL_CACHE.pop(next(iter(_EMBED_TBL_CACHE)), None)
+        _EMBED_TBL_CACHE[memory_id] = (time.monotonic() + _EMBED_TBL_CACHE_TTL, structure)
+
+
+def _embed_tbl_cache_invalidate(memory_ids: list[int]) -> None:
+    with _embed_tbl_cache_lock:
+        for memory_id in memory_ids:
+            _EMBED_TBL_CACHE.pop(memory_id, None)
+
+
 def update_memory_state(memory_id: int, state_updates: dict) -> None:
     """
     Update the state JSONB field for a memory.
-    
+
     Args:
         memory_id: The memory ID to update
         state_updates: Dictionary of state fields to update/merge
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # Merge state_updates into existing state
-        cur.execute("""
-            UPDATE memories
-            SET state = COALESCE(state, '{}'::jsonb) || %s::jsonb
-            WHERE id = %s;
-        """, (psycopg2.extras.Json(state_updates), memory_id))
+    with pooled_connection() as conn, conn.cursor() as cur:
+        # Merge state_updates into existing state (prepared - hot statement)
+        # Pre-serialized text coerces to the prepared $1 jsonb parameter
+        _execute_hot(conn, cur, "ms_update_state", (_json_dumps(state_updates), memory_id))
+        row = cur.fetchone()
         conn.commit()
-    finally:
-        cur.close()
-        conn.close()
+    # RETURNING hands back the post-write embedding_tables, so the cache is
+    # refreshed instead of just dropped - the next read costs nothing
+    if row is not None and isinstance(row[0], dict):
+        _embed_tbl_cache_put(memory_id, row[0])
+    else:
+        _embed_tbl_cache_invalidate([memory_id])
 
 
 def add_embedding_to_state(memory_id: int, table_name: str, model_name: str) -> None:
@@ -400,38 +1146,36 @@ def add_embedding_to_state(memory_id: int, table_name: str, model_name: str) ->
     This tracks which embedding models have generated embeddings in each table
     for this memory, enabling A/B testing and proper cleanup on delete.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # Use PostgreSQL JSONB operations to add model to table's array
-        # 1. Ensure embedding_tables exists as an object
-        # 2. Ensure the table_name key exists with an array
-        # 3. Append model_name if not already present
-        cur.execute("""
-            UPDATE memories
-            SET state = jsonb_set(
-                jsonb_set(
-                    COALESCE(state, '{}'::jsonb),
-                    '{embedding_tables}',
-                    COALESCE(state->'embedding_tables', '{}'::jsonb),
-                    true
-                ),
-                ARRAY['embedding_tables', %s],
-                (
-                    SELECT CASE 
-                        WHEN COALESCE(state->'embedding_tables'->%s, '[]'::jsonb) @> %s::jsonb
-                        THEN COALESCE(state->'embedding_tables'->%s, '[]'::jsonb)
-                        ELSE COALESCE(state->'embedding_tables'->%s, '[]'::jsonb) || %s::jsonb
-                    END
-                ),
-                true
-            )
-            WHERE id = %s;
-        """, (table_name, table_name, f'["{model_name}"]', table_name, table_name, f'["{model_name}"]', memory_id))
+    add_embedding_to_state_bulk([memory_id], table_name, model_name)
+
+
+def add_embedding_to_state_bulk(memory_ids: list[int], table_name: str, model_name: str) -> None:
+    """
+    Add an embedding model to state.embedding_tables[table_name] for many
+    memories in one round-trip.
+
+    Same state structure as add_embedding_to_state(); the ? membership test
+    in the statement makes appending an already-present model a no-op.
+    """
+    if not memory_ids:
+        return
+
+    with pooled_connection() as conn, conn.cursor() as cur:
+        # One || merge: ensure embedding_tables exists and append the model
+        # to the table's array unless already present.
+        # Prepared (hot statement) - runs on every embed path.
+        _execute_hot(conn, cur, "ms_add_embedding", (table_name, model_name, memory_ids))
+        rows = cur.fetchall()
         conn.commit()
-    finally:
-        cur.close()
-        conn.close()
+    # RETURNING refreshes the cache with the post-write structures in the
+    # same round-trip; ids the UPDATE didn't touch are dropped instead
+    returned = {row[0]: row[1] for row in rows}
+    for memory_id in memory_ids:
+        structure = returned.get(memory_id)
+        if isinstance(structure, dict):
+            _embed_tbl_cache_put(memory_id, structure)
+        else:
+            _embed_tbl_cache_invalidate([memory_id])
 
 
 def get_memory_embedding_tables(memory_id: int) -> dict[str, list[str]]:
@@ -444,32 +1188,70 @@ def get_memory_embedding_tables(memory_id: int) -> dict[str, list[str]]:
         "memory_768": ["embeddinggemma:300m"]
     }
     
+    Cached for up to 60s per id; in-process state writers invalidate, so
+    only writes from other processes can be seen stale, and only briefly.
+
     Returns:
         Dict mapping table names to list of model names
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("""
-            SELECT state->'embedding_tables' 
-            FROM memories 
-            WHERE id = %s;
-        """, (memory_id,))
+    cached = _embed_tbl_cache_get(memory_id)
+    if cached is not None:
+        return cached
+
+    with pooled_connection() as conn, conn.cursor() as cur:
+        # Prepared - runs on every retrieve/delete for a memory
+        _execute_hot(conn, cur, "ms_get_embedding_tables", (memory_id,))
         result = cur.fetchone()
-        if result and result[0]:
-            # Handle both V2 (array) and V3 (object) formats for backwards compatibility
-            embedding_tables = result[0]
-            if isinstance(embedding_tables, list):
-                # V2 format - convert to V3 format with empty model arrays
-                # This shouldn't happen after migration, but handle gracefully
-                return {table: [] for table in embedding_tables}
-            elif isinstance(embedding_tables, dict):
-                # V3 format - return as-is
-                return embedding_tables
+
+    structure: dict[str, list[str]] = {}
+    if result and result[0]:
+        # Handle both V2 (array) and V3 (object) formats for backwards compatibility
+        embedding_tables = result[0]
+        if isinstance(embedding_tables, list):
+            # V2 format - convert to V3 format with empty model arrays
+            # This shouldn't happen after migration, but handle gracefully
+            structure = {table: [] for table in embedding_tables}
+        elif isinstance(embedding_tables, dict):
+            # V3 format - return as-is
+            structure = embedding_tables
+    _embed_tbl_cache_put(memory_id, structure)
+    return structure
+
+
+def get_memory_embedding_tables_bulk(memory_ids: list[int]) -> dict[int, dict[str, list[str]]]:
+    """
+    Get embedding tables/models for many memories in one round-trip.
+
+    Batched counterpart of get_memory_embedding_tables() for callers that
+    would otherwise loop it per id (migrations, cleanup jobs, re-embedding);
+    avoids the N+1 query pattern with a single ANY(...) scan.
+
+    Returns:
+        Dict mapping memory_id to its V3 embedding-tables structure (every
+        requested id is present; missing/empty states map to {})
+    """
+    if not memory_ids:
         return {}
-    finally:
-        cur.close()
-        conn.close()
+
+    with pooled_connection() as conn, conn.cursor() as cur:
+        cur.execute("""
+            SELECT id, state->'embedding_tables'
+            FROM memories
+            WHERE id = ANY(%s::bigint[]);
+        """, (memory_ids,))
+        rows = dict(cur.fetchall())
+
+    result: dict[int, dict[str, list[str]]] = {}
+    for memory_id in memory_ids:
+        embedding_tables = rows.get(memory_id)
+        if isinstance(embedding_tables, list):
+            # V2 format - convert to V3 format with empty model arrays
+            result[memory_id] = {table: [] for table in embedding_tables}
+        elif isinstance(embedding_tables, dict):
+            result[memory_id] = embedding_tables
+        else:
+            result[memory_id] = {}
+    return result
 
 
 def remove_embedding_from_state(memory_id: int, table_name: str, model_name: str) -> None:
@@ -487,9 +1269,7 @@ def remove_embedding_from_state(memory_id: int, table_name: str, model_name: str
         table_name: The embedding table name (e.g., "memory_768")
         model_name: The model name to remove (e.g., "embeddinggemma:300m")
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with pooled_connection() as conn, conn.cursor() as cur:
         # Use PostgreSQL JSONB operations to remove model from table's array
         # 1. Remove the model from the array
         # 2. If array is now empty, remove the table key entirely
@@ -516,25 +1296,27 @@ def remove_embedding_from_state(memory_id: int, table_name: str, model_name: str
             AND state->'embedding_tables'->%s IS NOT NULL;
         """, (table_name, model_name, table_name, table_name, table_name, model_name, memory_id, table_name))
         conn.commit()
-    finally:
-        cur.close()
-        conn.close()
+    _embed_tbl_cache_invalidate([memory_id])
 
 
 # =============================================================================
 # OAuth Session Persistence Functions
 # =============================================================================
 
+@lru_cache(maxsize=4096)
 def _oauth_key_hash(token: str) -> str:
     """
     Generate a short hash for OAuth token keys.
-    
+
     Uses SHA256 truncated to 16 characters for clean, predictable keys
     while the full token is stored in JSONB value.
-    
+
+    Cached - the same bearer token is hashed on every request to a
+    protected endpoint, so each distinct token pays for the SHA-256 once.
+
     Args:
         token: The OAuth token string
-        
+
     Returns:
         16-character hex hash
     """
@@ -550,21 +1332,16 @@ def save_oauth_client(client_id: str, client_data: dict) -> None:
         client_data: Client data (serialized OAuthClientInformationFull)
     """
     key = f"oauth:client:{client_id}"
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with pooled_connection() as conn, conn.cursor() as cur:
         cur.execute("""
             INSERT INTO system_state (key, value)
             VALUES (%s, %s)
             ON CONFLICT (key) DO UPDATE SET
                 value = EXCLUDED.value,
                 updated_at = CURRENT_TIMESTAMP;
-        """, (key, psycopg2.extras.Json(client_data)))
+        """, (key, Json(client_data)))
         conn.commit()
-        logger.debug(f"💾 Saved OAuth client: {client_id}")
-    finally:
-        cur.close()
-        conn.close()
+    logger.debug(f"💾 Saved OAuth client: {client_id}")
 
 
 def save_oauth_access_token(token: str, token_data: dict) -> None:
@@ -576,21 +1353,16 @@ def save_oauth_access_token(token: str, token_data: dict) -> None:
         token_data: Token data (token, client_id, scopes, expires_at, resource)
     """
     key = f"oauth:access_token:{_oauth_key_hash(token)}"
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with pooled_connection() as conn, conn.cursor() as cur:
         cur.execute("""
             INSERT INTO system_state (key, value)
             VALUES (%s, %s)
             ON CONFLICT (key) DO UPDATE SET
                 value = EXCLUDED.value,
                 updated_at = CURRENT_TIMESTAMP;
-        """, (key, psycopg2.extras.Json(token_data)))
+        """, (key, Json(token_data)))
         conn.commit()
-        logger.debug(f"💾 Saved OAuth access token: {token[:10]}...")
-    finally:
-        cur.close()
-        conn.close()
+    logger.debug(f"💾 Saved OAuth access token: {token[:10]}...")
 
 
 def save_oauth_refresh_token(token: str, token_data: dict, access_token: str) -> None:
@@ -602,34 +1374,23 @@ def save_oauth_refresh_token(token: str, token_data: dict, access_token: str) ->
         token_data: Token data (token, client_id, scopes, expires_at)
         access_token: The associated access token
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # Save refresh token
-        refresh_key = f"oauth:refresh_token:{_oauth_key_hash(token)}"
-        cur.execute("""
+    token_hash = _oauth_key_hash(token)
+    with pooled_connection() as conn, conn.cursor() as cur:
+        # Refresh token and its refresh_to_access mapping in one multi-row
+        # upsert - one statement for the backend to parse instead of two
+        psycopg2.extras.execute_values(cur, """
             INSERT INTO system_state (key, value)
-            VALUES (%s, %s)
+            VALUES %s
             ON CONFLICT (key) DO UPDATE SET
                 value = EXCLUDED.value,
                 updated_at = CURRENT_TIMESTAMP;
-        """, (refresh_key, psycopg2.extras.Json(token_data)))
-        
-        # Save refresh_to_access mapping
-        mapping_key = f"oauth:refresh_to_access:{_oauth_key_hash(token)}"
-        cur.execute("""
-            INSERT INTO system_state (key, value)
-            VALUES (%s, %s)
-            ON CONFLICT (key) DO UPDATE SET
-                value = EXCLUDED.value,
-                updated_at = CURRENT_TIMESTAMP;
-        """, (mapping_key, psycopg2.extras.Json({"access_token": access_token})))
-        
+        """, [
+            (f"oauth:refresh_token:{token_hash}", Json(token_data)),
+            (f"oauth:refresh_to_access:{token_hash}", Json({"access_token": access_token})),
+        ])
+
         conn.commit()
-        logger.debug(f"💾 Saved OAuth refresh token: {token[:20]}...")
-    finally:
-        cur.close()
-        conn.close()
+    logger.debug(f"💾 Saved OAuth refresh token: {token[:20]}...")
 
 
 def delete_oauth_token(token: str, token_type: str = "access") -> None:
@@ -640,23 +1401,20 @@ def delete_oauth_token(token: str, token_type: str = "access") -> None:
         token: The token string
         token_type: "access" or "refresh"
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        if token_type == "access":
-            key = f"oauth:access_token:{_oauth_key_hash(token)}"
-        else:
-            # For refresh tokens, delete both the token and the mapping
-            key = f"oauth:refresh_token:{_oauth_key_hash(token)}"
-            mapping_key = f"oauth:refresh_to_access:{_oauth_key_hash(token)}"
-            cur.execute("DELETE FROM system_state WHERE key = %s;", (mapping_key,))
-        
-        cur.execute("DELETE FROM system_state WHERE key = %s;", (key,))
+    token_hash = _oauth_key_hash(token)
+    if token_type == "access":
+        keys = [f"oauth:access_token:{token_hash}"]
+    else:
+        # For refresh tokens, delete both the token and the mapping
+        keys = [
+            f"oauth:refresh_token:{token_hash}",
+            f"oauth:refresh_to_access:{token_hash}",
+        ]
+
+    with pooled_connection() as conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM system_state WHERE key = ANY(%s);", (keys,))
         conn.commit()
-        logger.debug(f"🗑️ Deleted OAuth {token_type} token: {token[:10]}...")
-    finally:
-        cur.close()
-        conn.close()
+    logger.debug(f"🗑️ Deleted OAuth {token_type} token: {token[:10]}...")
 
 
 def delete_oauth_client(client_id: str) -> None:
@@ -667,15 +1425,46 @@ def delete_oauth_client(client_id: str) -> None:
         client_id: The client ID to delete
     """
     key = f"oauth:client:{client_id}"
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
+    with pooled_connection() as conn, conn.cursor() as cur:
         cur.execute("DELETE FROM system_state WHERE key = %s;", (key,))
         conn.commit()
-        logger.debug(f"🗑️ Deleted OAuth client: {client_id}")
-    finally:
-        cur.close()
-        conn.close()
+    logger.debug(f"🗑️ Deleted OAuth client: {client_id}")
+
+
+def _delete_expired_oauth_rows(cur) -> int:
+    """
+    Delete expired OAuth token rows (and their companion mappings) in SQL.
+
+    A single CTE statement lets Postgres do the expiry filtering - no token
+    rows are shipped to Python just to be compared against the clock, and
+    the refresh_to_access companions of expired refresh tokens go in the
+    same round-trip.
+
+    Args:
+        cur: An open cursor; the caller owns the transaction/commit
+
+    Returns:
+        Number of rows deleted (tokens plus companion mappings)
+    """
+    cur.execute("""
+        WITH expired AS (
+            DELETE FROM system_state
+            WHERE (key LIKE 'oauth:access_token:%' OR key LIKE 'oauth:refresh_token:%')
+            AND (value->>'expires_at')::double precision < extract(epoch FROM now())
+            RETURNING key
+        ), mappings AS (
+            DELETE FROM system_state
+            WHERE key IN (
+                SELECT 'oauth:refresh_to_access:' ||
+                       substring(key FROM char_length('oauth:refresh_token:') + 1)
+                FROM expired
+                WHERE key LIKE 'oauth:refresh_token:%'
+            )
+            RETURNING key
+        )
+        SELECT (SELECT count(*) FROM expired) + (SELECT count(*) FROM mappings);
+    """)
+    return cur.fetchone()[0]
 
 
 def load_oauth_sessions() -> dict[str, Any]:
@@ -701,83 +1490,67 @@ def load_oauth_sessions() -> dict[str, Any]:
             "refresh_to_access": {},
         }
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        # Load all OAuth keys
+    with pooled_connection() as conn, conn.cursor() as cur:
+        # Drop expired tokens server-side first so only live rows ever cross
+        # the wire - the loader below then needs no expiry checks at all
+        expired = _delete_expired_oauth_rows(cur)
+        if expired:
+            conn.commit()
+            logger.info(f"🧹 Cleaned up {expired} expired OAuth tokens from database")
+
+        # Load the surviving OAuth keys
         cur.execute("""
             SELECT key, value FROM system_state
             WHERE key LIKE 'oauth:%';
         """)
         rows = cur.fetchall()
-        
+
         clients = {}
         access_tokens = {}
         refresh_tokens = {}
         refresh_to_access = {}
-        expired_keys = []
-        
-        current_time = time.time()
-        
+
+        # Index refresh tokens by hash up front so resolving each
+        # refresh_to_access mapping below is one dict lookup instead of a
+        # rescan of every row (the old inner loop was O(N²) in total rows)
+        refresh_token_by_hash = {}
+        for key, value in rows:
+            if key.startswith("oauth:refresh_token:"):
+                token = value.get("token")
+                if token:
+                    refresh_token_by_hash[key[len("oauth:refresh_token:"):]] = token
+
         for key, value in rows:
             if key.startswith("oauth:client:"):
                 client_id = key[len("oauth:client:"):]
                 clients[client_id] = value
-                
+
             elif key.startswith("oauth:access_token:"):
-                # Check expiry
-                expires_at = value.get("expires_at")
-                if expires_at and expires_at < current_time:
-                    expired_keys.append(key)
-                    logger.debug(f"🧹 Found expired access token: {value.get('token', '')[:10]}...")
-                else:
-                    token = value.get("token")
-                    if token:
-                        access_tokens[token] = value
-                        
+                token = value.get("token")
+                if token:
+                    access_tokens[token] = value
+
             elif key.startswith("oauth:refresh_token:"):
-                # Check expiry
-                expires_at = value.get("expires_at")
-                if expires_at and expires_at < current_time:
-                    expired_keys.append(key)
-                    # Also mark the mapping for cleanup
-                    hash_part = key[len("oauth:refresh_token:"):]
-                    expired_keys.append(f"oauth:refresh_to_access:{hash_part}")
-                    logger.debug(f"🧹 Found expired refresh token: {value.get('token', '')[:20]}...")
-                else:
-                    token = value.get("token")
-                    if token:
-                        refresh_tokens[token] = value
-                        
+                token = value.get("token")
+                if token:
+                    refresh_tokens[token] = value
+
             elif key.startswith("oauth:refresh_to_access:"):
-                # Will be validated after loading refresh tokens
+                # Resolve against the prebuilt hash index - mappings whose
+                # refresh token expired were already deleted server-side
                 hash_part = key[len("oauth:refresh_to_access:"):]
                 access_token = value.get("access_token")
                 if access_token:
-                    # Find the refresh token that maps to this hash
-                    for rt_key, rt_val in rows:
-                        if rt_key == f"oauth:refresh_token:{hash_part}":
-                            rt = rt_val.get("token")
-                            if rt:
-                                refresh_to_access[rt] = access_token
-                            break
-        
-        # Cleanup expired tokens from database
-        if expired_keys:
-            for exp_key in expired_keys:
-                cur.execute("DELETE FROM system_state WHERE key = %s;", (exp_key,))
-            conn.commit()
-            logger.info(f"🧹 Cleaned up {len(expired_keys)} expired OAuth tokens from database")
-        
+                    rt = refresh_token_by_hash.get(hash_part)
+                    if rt:
+                        refresh_to_access[rt] = access_token
+
         return {
             "clients": clients,
             "access_tokens": access_tokens,
             "refresh_tokens": refresh_tokens,
             "refresh_to_access": refresh_to_access,
         }
-    finally:
-        cur.close()
-        conn.close()
 
 
 def cleanup_expired_oauth_sessions() -> int:
@@ -790,34 +1563,10 @@ def cleanup_expired_oauth_sessions() -> int:
     if not table_exists('system_state'):
         return 0
     
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("""
-            SELECT key, value FROM system_state
-            WHERE key LIKE 'oauth:access_token:%' OR key LIKE 'oauth:refresh_token:%';
-        """)
-        rows = cur.fetchall()
-        
-        expired_keys = []
-        current_time = time.time()
-        
-        for key, value in rows:
-            expires_at = value.get("expires_at")
-            if expires_at and expires_at < current_time:
-                expired_keys.append(key)
-                # If it's a refresh token, also clean up the mapping
-                if key.startswith("oauth:refresh_token:"):
-                    hash_part = key[len("oauth:refresh_token:"):]
-                    expired_keys.append(f"oauth:refresh_to_access:{hash_part}")
-        
-        if expired_keys:
-            for exp_key in expired_keys:
-                cur.execute("DELETE FROM system_state WHERE key = %s;", (exp_key,))
+    with pooled_connection() as conn, conn.cursor() as cur:
+        expired = _delete_expired_oauth_rows(cur)
+        if expired:
             conn.commit()
-            logger.info(f"🧹 Cleaned up {len(expired_keys)} expired OAuth tokens")
-        
-        return len(expired_keys)
-    finally:
-        cur.close()
-        conn.close()
+            logger.info(f"🧹 Cleaned up {expired} expired OAuth tokens")
+
+        return expired
@@ -4,12 +4,25 @@ BITEY Cheese Encryption Module
 AES-256-GCM authenticated encryption with Argon2id key derivation.
 Provides optional encryption for memory content storage.
 
-Storage format in BYTEA:
+Storage format in BYTEA (V2, current):
+[12 bytes nonce][N bytes ciphertext][16 bytes auth_tag]
+
+The AES key is derived once per process from the configured key via
+Argon2id with a random per-deployment salt persisted in system_state;
+per-blob uniqueness comes from the random nonce. Legacy V1 blobs embed a
+per-blob salt instead:
 [16 bytes salt][12 bytes nonce][N bytes ciphertext][16 bytes auth_tag]
+and are still readable - decryption tries V2 (deployment salt, then the
+legacy built-in salt) and falls back to the V1 parse when the auth tag
+rejects (the tag makes a wrong parse fail with certainty, so no format
+byte is needed).
 """
 
+import hashlib
 import os
 import logging
+import threading
+from functools import lru_cache
 from typing import Optional
 
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
@@ -28,6 +41,14 @@ ARGON2_TIME_COST = 3  # iterations
 ARGON2_MEMORY_COST = 65536  # 64 MB in KB
 ARGON2_PARALLELISM = 4
 
+# Legacy fixed salt for the V2 root-key derivation. Early V2 blobs were
+# written under a root key derived with this public constant; it is kept
+# only so those blobs stay decryptable. New root keys use a random
+# per-deployment salt persisted in system_state (_get_deployment_salt) -
+# a shared global salt would let an attacker amortize one Argon2id
+# dictionary precomputation across every deployment.
+LEGACY_ROOT_KEY_SALT = hashlib.sha256(b"memory-mcp-ce:content-root-key:v2").digest()[:SALT_SIZE]
+
 
 def get_encryption_key() -> Optional[str]:
     """
@@ -74,50 +95,198 @@ def derive_key(password: str, salt: bytes) -> bytes:
     )
 
 
+@lru_cache(maxsize=16)
+def _key_fingerprint(password: str) -> bytes:
+    """Short stable fingerprint of the encryption key for cache keying."""
+    return hashlib.sha256(password.encode('utf-8')).digest()[:16]
+
+
+@lru_cache(maxsize=1024)
+def _derive_cached(pw_fingerprint: bytes, salt: bytes) -> bytes:
+    """
+    Cached Argon2id derivation keyed by (key fingerprint, salt).
+
+    The salt is random per blob, so each distinct blob pays the 64 MB
+    memory-hard derivation once - but the same (key, salt) pair recurs
+    every time a memory is re-fetched and re-decrypted, and those repeat
+    derivations dominated decryption cost. The fingerprint (not the raw
+    password) is the cache key so the password isn't retained in cache
+    entries; it also invalidates naturally if the configured key changes.
+
+    Args:
+        pw_fingerprint: _key_fingerprint() of the current encryption key
+        salt: The blob's Argon2id salt
+
+    Returns:
+        32-byte derived key suitable for AES-256
+    """
+    del pw_fingerprint  # participates in the cache key only
+    return derive_key(get_encryption_key(), salt)
+
+
+# Per-deployment salt for the V2 root key, loaded from (or generated into)
+# system_state on first use. Cached for the process lifetime; a load failure
+# is NOT cached so a transient DB problem doesn't pin the legacy fallback.
+_deployment_salt: Optional[bytes] = None
+_deployment_salt_lock = threading.Lock()
+
+
+def _get_deployment_salt() -> bytes:
+    """
+    Get the deployment's root-key salt, generating and persisting it on
+    first use.
+
+    Stored under the encryption_root_salt key in system_state so every
+    worker against the same database derives the same root key. Falls back
+    to the legacy built-in salt (with a warning) if the database can't be
+    reached - blobs written that way stay decryptable via the legacy trial
+    path.
+
+    Returns:
+        16-byte salt for the root-key Argon2id derivation
+    """
+    global _deployment_salt
+    if _deployment_salt is not None:
+        return _deployment_salt
+    with _deployment_salt_lock:
+        if _deployment_salt is not None:
+            return _deployment_salt
+        try:
+            # Imported here: database.py has no business importing at
+            # encryption import time (and tools.py pulls in both)
+            from app.database import get_system_state, set_system_state
+            state = get_system_state() or {}
+            salt_hex = state.get('encryption_root_salt')
+            if salt_hex:
+                _deployment_salt = bytes.fromhex(salt_hex)
+            else:
+                salt = os.urandom(SALT_SIZE)
+                set_system_state(encryption_root_salt=salt.hex())
+                logger.info("🔒 Generated per-deployment encryption root salt")
+                _deployment_salt = salt
+        except Exception as e:
+            logger.warning(
+                f"⚠️ Could not load deployment root salt, "
+                f"falling back to built-in salt: {e}"
+            )
+            return LEGACY_ROOT_KEY_SALT
+    return _deployment_salt
+
+
+@lru_cache(maxsize=8)
+def _root_aesgcm(pw_fingerprint: bytes, salt: bytes) -> AESGCM:
+    """
+    Shared AESGCM cipher for a V2 root key: one Argon2id derivation and one
+    AES key schedule per (key, salt) for the process lifetime.
+
+    All V2 blobs share the root key; per-blob uniqueness comes from the
+    random AES-GCM nonce. The instance is stateless and thread-safe; keying
+    by the key fingerprint means a rotated key gets a fresh cipher.
+    """
+    return AESGCM(_derive_cached(pw_fingerprint, salt))
+
+
 def encrypt_content(plaintext: str) -> Optional[bytes]:
     """
-    Encrypt content using AES-256-GCM with Argon2id key derivation.
-    
+    Encrypt content using AES-256-GCM under the process root key.
+
     Args:
         plaintext: The content string to encrypt
-    
+
     Returns:
-        Encrypted blob as bytes: [salt][nonce][ciphertext+tag]
+        Encrypted V2 blob as bytes: [nonce][ciphertext+tag]
         Returns None if encryption is not enabled.
     """
     key_str = get_encryption_key()
     if not key_str:
         return None
-    
+
     try:
-        # Generate random salt and nonce
-        salt = os.urandom(SALT_SIZE)
+        # Per-blob uniqueness comes from the random nonce; the expensive
+        # Argon2id derivation happened once for the process root key
         nonce = os.urandom(NONCE_SIZE)
-        
-        # Derive key using Argon2id
-        key = derive_key(key_str, salt)
-        
-        # Encrypt with AES-256-GCM
-        aesgcm = AESGCM(key)
+
+        # Encrypt with AES-256-GCM (shared cipher instance)
+        aesgcm = _root_aesgcm(_key_fingerprint(key_str), _get_deployment_salt())
         ciphertext = aesgcm.encrypt(nonce, plaintext.encode('utf-8'), None)
-        
-        # Combine: salt + nonce + ciphertext (includes auth tag)
-        encrypted_blob = salt + nonce + ciphertext
-        
-        return encrypted_blob
-        
+
+        # Combine: nonce + ciphertext (includes auth tag)
+        return nonce + ciphertext
+
     except Exception as e:
         logger.error(f"Encryption failed: {e}")
         return None
 
 
+def _decrypt_v1(key_str: str, encrypted_blob: bytes) -> str:
+    """
+    Decrypt a legacy V1 blob: [salt][nonce][ciphertext+tag].
+
+    Pays one (cached) Argon2id derivation for the blob's embedded salt.
+    Raises on failure; decrypt_content handles the logging.
+    """
+    salt = encrypted_blob[:SALT_SIZE]
+    nonce = encrypted_blob[SALT_SIZE:SALT_SIZE + NONCE_SIZE]
+    ciphertext = encrypted_blob[SALT_SIZE + NONCE_SIZE:]
+
+    key = _derive_cached(_key_fingerprint(key_str), salt)
+    aesgcm = AESGCM(key)
+    return aesgcm.decrypt(nonce, ciphertext, None).decode('utf-8')
+
+
+def _decrypt_one(key_str: str, aesgcm: AESGCM, encrypted_blob: bytes) -> Optional[str]:
+    """
+    Decrypt a single blob with the key material already resolved.
+
+    Tries the V2 format ([nonce][ciphertext+tag]) first - the cheap path
+    and the only one new writes produce - under the deployment root key,
+    then under the legacy built-in-salt root key, then falls back to the
+    V1 parse ([salt][nonce][ciphertext+tag], per-blob Argon2id). The GCM
+    auth tag makes a wrong parse/key fail deterministically, so the trial
+    order can't misdecrypt a blob of any vintage.
+    """
+    # Minimum V2 size: nonce + at least 1 byte ciphertext + tag
+    min_size = NONCE_SIZE + 1 + TAG_SIZE
+    if len(encrypted_blob) < min_size:
+        logger.warning(f"Encrypted blob too small: {len(encrypted_blob)} bytes")
+        return None
+
+    nonce = encrypted_blob[:NONCE_SIZE]
+    ciphertext = encrypted_blob[NONCE_SIZE:]
+    try:
+        return aesgcm.decrypt(nonce, ciphertext, None).decode('utf-8')
+    except Exception:
+        pass
+
+    # V2 blobs written before the per-deployment salt existed used a root
+    # key derived with the legacy built-in salt - try that cipher next
+    # (cached; skipped when it would be the same cipher)
+    legacy = _root_aesgcm(_key_fingerprint(key_str), LEGACY_ROOT_KEY_SALT)
+    if legacy is not aesgcm:
+        try:
+            return legacy.decrypt(nonce, ciphertext, None).decode('utf-8')
+        except Exception:
+            pass
+
+    # V1 blobs are at least SALT_SIZE longer than the V2 minimum
+    if len(encrypted_blob) >= SALT_SIZE + min_size:
+        try:
+            return _decrypt_v1(key_str, encrypted_blob)
+        except Exception as e:
+            logger.warning(f"Decryption failed (wrong key or corrupted data): {e}")
+            return None
+
+    logger.warning("Decryption failed (wrong key or corrupted data)")
+    return None
+
+
 def decrypt_content(encrypted_blob: bytes) -> Optional[str]:
     """
     Decrypt content encrypted with encrypt_content().
-    
+
     Args:
-        encrypted_blob: The encrypted bytes [salt][nonce][ciphertext+tag]
-    
+        encrypted_blob: The encrypted bytes
+
     Returns:
         Decrypted plaintext string, or None if decryption fails.
     """
@@ -125,52 +294,62 @@ def decrypt_content(encrypted_blob: bytes) -> Optional[str]:
     if not key_str:
         logger.debug("Cannot decrypt: no encryption key configured")
         return None
-    
-    try:
-        # Minimum size: salt + nonce + at least 1 byte ciphertext + tag
-        min_size = SALT_SIZE + NONCE_SIZE + 1 + TAG_SIZE
-        if len(encrypted_blob) < min_size:
-            logger.warning(f"Encrypted blob too small: {len(encrypted_blob)} bytes")
-            return None
-        
-        # Extract components
-        salt = encrypted_blob[:SALT_SIZE]
-        nonce = encrypted_blob[SALT_SIZE:SALT_SIZE + NONCE_SIZE]
-        ciphertext = encrypted_blob[SALT_SIZE + NONCE_SIZE:]
-        
-        # Derive key using Argon2id with extracted salt
-        key = derive_key(key_str, salt)
-        
-        # Decrypt with AES-256-GCM
-        aesgcm = AESGCM(key)
-        plaintext_bytes = aesgcm.decrypt(nonce, ciphertext, None)
-        
-        return plaintext_bytes.decode('utf-8')
-        
-    except Exception as e:
-        # This catches wrong key, corrupted data, tampered data, etc.
-        logger.warning(f"Decryption failed (wrong key or corrupted data): {e}")
-        return None
+
+    return _decrypt_one(
+        key_str,
+        _root_aesgcm(_key_fingerprint(key_str), _get_deployment_salt()),
+        encrypted_blob,
+    )
+
+
+def decrypt_content_batch(encrypted_blobs: "list[bytes]") -> "list[Optional[str]]":
+    """
+    Decrypt a batch of blobs, resolving the key material once.
+
+    The per-call overhead of decrypt_content (key lookup, fingerprint,
+    cipher fetch) is hoisted out of the loop, which matters when a result
+    page decrypts dozens of rows.
+
+    Args:
+        encrypted_blobs: Encrypted blobs in result order
+
+    Returns:
+        Plaintexts in the same order; None for any blob that fails.
+    """
+    key_str = get_encryption_key()
+    if not key_str:
+        logger.debug("Cannot decrypt: no encryption key configured")
+        return [None] * len(encrypted_blobs)
+
+    aesgcm = _root_aesgcm(_key_fingerprint(key_str), _get_deployment_salt())
+    return [_decrypt_one(key_str, aesgcm, blob) for blob in encrypted_blobs]
 
 
-def decode_or_decrypt_content(content_bytes: bytes, is_encrypted: bool) -> Optional[str]:
+def decode_or_decrypt_content(content_bytes: "bytes | memoryview", is_encrypted: bool) -> Optional[str]:
     """
     Decode or decrypt content based on the enc flag.
-    
+
+    Accepts bytes or the memoryview psycopg2 returns for BYTEA columns, so
+    plain content decodes straight from the driver's buffer without callers
+    materializing an intermediate bytes copy per row.
+
     Args:
-        content_bytes: The raw bytes from database
+        content_bytes: The raw bytes (or memoryview) from database
         is_encrypted: The enc flag from database
-    
+
     Returns:
         Plaintext string, or None if decryption fails or key not available.
     """
     if is_encrypted:
-        # Encrypted content - need key to decrypt
+        # Encrypted content - need key to decrypt (one bytes copy here is
+        # noise next to the Argon2 KDF inside decrypt_content)
+        if isinstance(content_bytes, memoryview):
+            content_bytes = bytes(content_bytes)
         return decrypt_content(content_bytes)
     else:
-        # Plain UTF-8 encoded content
+        # Plain UTF-8 encoded content - str() decodes bytes-like directly
         try:
-            return content_bytes.decode('utf-8')
+            return str(content_bytes, 'utf-8')
         except Exception as e:
             logger.warning(f"Failed to decode UTF-8 content: {e}")
             return None
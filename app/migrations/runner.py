@@ -13,7 +13,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 # Current database schema version
-CURRENT_DB_VERSION = 7
+CURRENT_DB_VERSION = 8
 
 # Advisory lock ID for migrations (unique arbitrary number)
 MIGRATION_LOCK_ID = 123456789
@@ -40,19 +40,21 @@ def run_migrations(embedding_dim: int) -> None:
     # Import here to avoid circular imports
     from app.database import (
         get_system_state,
-        get_existing_embedding_tables,
+        _invalidate_system_state_cache,
+        introspect_schema,
         create_system_state_table,
         create_memories_table,
         create_label_tokens_table,
         get_db_connection,
         table_exists,
     )
-    from app.migrations.v1_to_v2 import migrate_v1_to_v2, is_v1_schema
+    from app.migrations.v1_to_v2 import migrate_v1_to_v2
     from app.migrations.v2_to_v3 import migrate_v2_to_v3
     from app.migrations.v3_to_v4 import migrate_v3_to_v4
     from app.migrations.v4_to_v5 import migrate_v4_to_v5
     from app.migrations.v5_to_v6 import migrate_v5_to_v6
     from app.migrations.v6_to_v7 import migrate_v6_to_v7
+    from app.migrations.v7_to_v8 import migrate_v7_to_v8
     
     # Get connection for advisory lock
     conn = get_db_connection()
@@ -69,17 +71,26 @@ def run_migrations(embedding_dim: int) -> None:
             return
         
         logger.info("🔒 Acquired migration lock")
-        
-        # Check current database state
-        system_state = get_system_state()
-        
+
+        # The version decision below MUST come from a fresh read: another
+        # worker may have finished migrating between our pre-lock warm-start
+        # probe and winning the lock, and acting on the process-local cache
+        # would re-run the whole chain from a stale version
+        _invalidate_system_state_cache()
+
+        # Check current database state - one round-trip answers "is this a
+        # fresh install, a V1 install, or a versioned V2+ install" instead
+        # of probing table-by-table
+        schema = introspect_schema()
+        system_state = get_system_state(conn=conn) if schema['system_state_exists'] else None
+
         if system_state is None:
             # No system_state table - could be fresh install or V1
-            existing_tables = get_existing_embedding_tables()
-            
+            existing_tables = schema['embedding_tables']
+
             if existing_tables:
                 # V1 installation detected - need migration
-                v1_tables = [t for t in existing_tables if is_v1_schema(t)]
+                v1_tables = schema['v1_tables']
                 if v1_tables:
                     logger.info("🔍 Detected V1 schema - migration required")
                     migrate_v1_to_v2(embedding_dim)
@@ -89,6 +100,7 @@ def run_migrations(embedding_dim: int) -> None:
                     migrate_v4_to_v5()
                     migrate_v5_to_v6()
                     migrate_v6_to_v7()
+                    migrate_v7_to_v8()
                 else:
                     # Tables exist but already V2+ schema (partial migration?)
                     # Run v4→v5 to create fresh V5 system_state, then continue
@@ -96,12 +108,14 @@ def run_migrations(embedding_dim: int) -> None:
                     migrate_v4_to_v5()
                     migrate_v5_to_v6()
                     migrate_v6_to_v7()
+                    migrate_v7_to_v8()
             else:
-                # Fresh installation - create V7 schema from scratch
-                logger.info("🆕 Fresh installation detected - creating V7 schema")
-                create_system_state_table()
-                create_memories_table()
-                create_label_tokens_table()
+                # Fresh installation - create V8 schema from scratch, all on
+                # the lock connection instead of three separate pool borrows
+                logger.info("🆕 Fresh installation detected - creating V8 schema")
+                create_system_state_table(conn=conn)
+                create_memories_table(conn=conn)
+                create_label_tokens_table(conn=conn)
         
         else:
             # system_state exists - check version
@@ -140,16 +154,21 @@ def run_migrations(embedding_dim: int) -> None:
                     # V6 → V7 migration (label_tokens table for trending labels)
                     migrate_v6_to_v7()
                     current_version = 7
+                
+                if current_version == 7:
+                    # V7 → V8 migration (labels GIN index → jsonb_path_ops)
+                    migrate_v7_to_v8()
+                    current_version = 8
             else:
                 logger.info(f"✅ Database schema is up to date (version {current_version})")
         
         # Ensure memories table exists (idempotent)
         if not table_exists('memories'):
-            create_memories_table()
-        
+            create_memories_table(conn=conn)
+
         # Ensure label_tokens table exists (idempotent)
         if not table_exists('label_tokens'):
-            create_label_tokens_table()
+            create_label_tokens_table(conn=conn)
     
     finally:
         # Release advisory lock if we acquired it
@@ -11,17 +11,19 @@ This migration:
 4. Updates state.embedding_tables for each memory
 """
 
-import psycopg2
-import psycopg2.extras
-import hashlib
+import concurrent.futures
 import logging
+from functools import lru_cache
+
+from psycopg2 import sql
 
 from app.database import (
     get_db_connection,
     get_existing_embedding_tables,
     create_system_state_table,
     create_memories_table,
-    create_embedding_table,
+    create_embedding_table_plain,
+    create_embedding_table_indexes,
     set_system_state,
 )
 from app.migrations.runner import CURRENT_DB_VERSION
@@ -29,19 +31,28 @@ from app.migrations.runner import CURRENT_DB_VERSION
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
 def is_v1_schema(table_name: str) -> bool:
-    """Check if an embedding table has V1 schema (content column exists)."""
+    """
+    Check if an embedding table has V1 schema (content column exists).
+
+    Cached per table name - a table's schema generation doesn't change
+    underneath a running migration, so repeat probes would just burn
+    round-trips on information_schema.
+    """
     conn = get_db_connection()
     cur = conn.cursor()
     try:
+        # Probe pg_attribute directly instead of information_schema.columns -
+        # a single indexed catalog lookup vs a multi-join ACL-filtered view
         cur.execute("""
             SELECT EXISTS (
-                SELECT FROM information_schema.columns 
-                WHERE table_schema = 'public' 
-                AND table_name = %s
-                AND column_name = 'content'
+                SELECT 1 FROM pg_attribute
+                WHERE attrelid = to_regclass(%s)
+                AND attname = 'content'
+                AND NOT attisdropped
             );
-        """, (table_name,))
+        """, (f'public.{table_name}',))
         has_content = cur.fetchone()[0]
         return has_content
     finally:
@@ -49,10 +60,119 @@ def is_v1_schema(table_name: str) -> bool:
         conn.close()
 
 
+def _restore_v1_leftovers() -> None:
+    """
+    Recover from a crash in the middle of a previous table rebuild.
+
+    A crash after _rebuild_v1_table's rename leaves memory_{dims}_v1_old
+    (the real V1 data) next to a truncated recreated memory_{dims}. Drop
+    the half-built table and rename the original back so V1 detection and
+    the rebuild run again from the authoritative data. Discovery queries
+    exclude *_v1_old, so the staging tables are invisible everywhere else.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(r"""
+            SELECT relname FROM pg_class
+            WHERE relkind = 'r'
+            AND relnamespace = 'public'::regnamespace
+            AND relname LIKE 'memory\_%\_v1\_old';
+        """)
+        leftovers = [row[0] for row in cur.fetchall()]
+        for old_table in leftovers:
+            table_name = old_table[:-len('_v1_old')]
+            logger.warning(
+                f"⚠️ Found interrupted rebuild of {table_name} - "
+                f"restoring original V1 table from {old_table}"
+            )
+            cur.execute(sql.SQL("DROP TABLE IF EXISTS {tbl} CASCADE;").format(
+                tbl=sql.Identifier(table_name)))
+            cur.execute(sql.SQL("ALTER TABLE {old} RENAME TO {tbl};").format(
+                old=sql.Identifier(old_table), tbl=sql.Identifier(table_name)))
+        conn.commit()
+        if leftovers:
+            # The restored tables are V1 again - drop any schema probes
+            # memoized before the restore
+            is_v1_schema.cache_clear()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def _rebuild_v1_table(table_name: str) -> int:
+    """
+    Rebuild one V1 embedding table with V2 schema on its own connection.
+
+    The data move is pure SQL: join the old rows to memories on the indexed
+    content hash, so no embedding ever crosses into Python. Safe to run
+    concurrently with other tables' rebuilds - no shared state.
+
+    Returns:
+        Number of embeddings moved into the rebuilt table
+    """
+    dims = int(table_name.replace('memory_', ''))
+    old_table = f"{table_name}_v1_old"
+
+    logger.info(f"🔄 Rebuilding embedding table: {table_name}")
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute("SET synchronous_commit = off;")
+
+        # Rename the old table aside so the V2 table is built in its place
+        cur.execute(sql.SQL("ALTER TABLE {tbl} RENAME TO {old};").format(
+            tbl=sql.Identifier(table_name), old=sql.Identifier(old_table)))
+        conn.commit()
+
+        # Create new V2 table WITHOUT indexes and UNLOGGED - the bulk
+        # insert below skips both per-row index maintenance and WAL.
+        # If the server crashes mid-migration the unlogged table is
+        # truncated on recovery, but the renamed V1 table still exists,
+        # so re-running the migration recovers cleanly.
+        logger.warning(
+            f"⚠️ {table_name} is staged UNLOGGED during migration - "
+            f"a crash before completion requires re-running the migration"
+        )
+        create_embedding_table_plain(dims, unlogged=True)
+
+        # Re-link embeddings to their memories entirely server-side
+        cur.execute(sql.SQL("""
+            INSERT INTO {tbl} (memory_id, embedding, namespace, embedding_model)
+            SELECT m.id, v.embedding, COALESCE(v.namespace, 'default'), v.embedding_model
+            FROM {old} v
+            JOIN memories m ON m.content_sha256 = digest(v.content, 'sha256')
+            ON CONFLICT (memory_id, embedding_model) DO NOTHING;
+        """).format(tbl=sql.Identifier(table_name), old=sql.Identifier(old_table)))
+        moved = cur.rowcount
+
+        # One sequential WAL write for the loaded table, then the old
+        # data is safely durable and the renamed table can go
+        cur.execute(sql.SQL("ALTER TABLE {tbl} SET LOGGED;").format(tbl=sql.Identifier(table_name)))
+        cur.execute(sql.SQL("DROP TABLE IF EXISTS {old} CASCADE;").format(old=sql.Identifier(old_table)))
+        conn.commit()
+
+        # Build indexes once on the loaded table
+        create_embedding_table_indexes(dims)
+        return moved
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            cur.execute("RESET synchronous_commit;")
+            conn.commit()
+        except Exception:
+            pass
+        cur.close()
+        conn.close()
+
+
 def migrate_v1_to_v2(embedding_dim: int) -> None:
     """
     Migrate from V1 (single table) to V2 (split table) architecture.
-    
+
     This migration:
     1. Creates the new memories and system_state tables
     2. Extracts content from existing memory_{dims} tables into memories
@@ -60,146 +180,112 @@ def migrate_v1_to_v2(embedding_dim: int) -> None:
     4. Updates state.embedding_tables for each memory
     """
     logger.info("🔄 Starting V1 → V2 migration...")
-    
+
+    # Step 0: Recover any table rebuild a previous run crashed out of
+    _restore_v1_leftovers()
+
     # Step 1: Create new tables
     create_system_state_table()
     create_memories_table()
-    
-    # Initialize system_state with version 1 (pre-migration)
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("""
-            INSERT INTO system_state (id, db_version) 
-            VALUES (1, 1)
-            ON CONFLICT (id) DO NOTHING;
-        """)
-        conn.commit()
-    finally:
-        cur.close()
-        conn.close()
-    
+
+    # Initialize system_state with version 1 (pre-migration) so an
+    # interrupted run re-enters the migration path on restart
+    set_system_state(db_version=1)
+
     # Step 2: Find all existing V1 embedding tables
     existing_tables = get_existing_embedding_tables()
     v1_tables = [t for t in existing_tables if is_v1_schema(t)]
-    
+
     if not v1_tables:
         logger.info("📭 No V1 tables found to migrate")
         # Just set version and return
         set_system_state(db_version=CURRENT_DB_VERSION)
         return
-    
+
     logger.info(f"📋 Found {len(v1_tables)} V1 tables to migrate: {v1_tables}")
-    
-    # Step 3: Extract unique memories and migrate
-    # We'll use content hash for deduplication across tables
-    content_to_memory_id: dict[str, int] = {}
-    
+
     conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    
+    cur = conn.cursor()
+
     try:
+        # Migration commits don't need to wait on fsync: if the server
+        # crashes mid-run the migration re-runs from the renamed V1 tables
+        # anyway, so async commits just remove 1-10ms of WAL-flush latency
+        # per COMMIT. Session-scoped; reset before the connection returns
+        # to the pool.
+        cur.execute("SET synchronous_commit = off;")
+
+        # Step 3: Extract unique memories - dedup is delegated to Postgres.
+        # A generated sha256 column with a migration-scoped UNIQUE index lets
+        # INSERT ... ON CONFLICT DO NOTHING collapse duplicate content across
+        # all V1 tables without a single row crossing into Python.
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pgcrypto;")
+        cur.execute("""
+            ALTER TABLE memories
+            ADD COLUMN IF NOT EXISTS content_sha256 BYTEA
+            GENERATED ALWAYS AS (digest(content, 'sha256')) STORED;
+        """)
+        cur.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_memories_sha
+            ON memories(content_sha256);
+        """)
+        conn.commit()
+
+        migrated = 0
         for table_name in v1_tables:
             logger.info(f"🔄 Migrating table: {table_name}")
-            
-            # Extract dimension from table name
-            dims = int(table_name.replace('memory_', ''))
-            
-            # Get all rows from V1 table
-            cur.execute(f"""
-                SELECT id, content, embedding, namespace, labels, source, 
-                       timestamp, enc, embedding_model, state
-                FROM {table_name}
-                ORDER BY id;
-            """)
-            rows = cur.fetchall()
-            
-            logger.info(f"   Found {len(rows)} memories in {table_name}")
-            
-            for row in rows:
-                # Create content hash for deduplication
-                content_bytes = bytes(row['content'])
-                content_hash = hashlib.sha256(content_bytes).hexdigest()
-                
-                if content_hash in content_to_memory_id:
-                    # Content already migrated, just add embedding reference
-                    memory_id = content_to_memory_id[content_hash]
-                    logger.debug(f"   Dedup: content already exists as memory #{memory_id}")
-                else:
-                    # Insert new memory into memories table
-                    cur.execute("""
-                        INSERT INTO memories (content, namespace, labels, source, timestamp, enc, state)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        RETURNING id;
-                    """, (
-                        content_bytes,
-                        row['namespace'] or 'default',
-                        psycopg2.extras.Json(row['labels'] if row['labels'] else []),
-                        row['source'],
-                        row['timestamp'],
-                        row['enc'] if row['enc'] is not None else False,
-                        psycopg2.extras.Json({'embedding_tables': [table_name]})
-                    ))
-                    memory_id = cur.fetchone()['id']
-                    content_to_memory_id[content_hash] = memory_id
-                
-                # We'll rebuild the embedding table after dropping the old one
-                # For now, just track the mapping
-            
-            conn.commit()
-        
-        logger.info(f"✅ Migrated {len(content_to_memory_id)} unique memories to memories table")
-        
-        # Step 4: Rebuild embedding tables with V2 schema
-        for table_name in v1_tables:
-            dims = int(table_name.replace('memory_', ''))
-            
-            logger.info(f"🔄 Rebuilding embedding table: {table_name}")
-            
-            # Get embeddings from old table before dropping
-            cur.execute(f"""
-                SELECT content, embedding, namespace, embedding_model
-                FROM {table_name};
-            """)
-            old_embeddings = cur.fetchall()
-            
-            # Drop old table
-            cur.execute(f"DROP TABLE IF EXISTS {table_name} CASCADE;")
-            conn.commit()
-            
-            # Create new V2 table
-            create_embedding_table(dims)
-            
-            # Re-insert embeddings with foreign key references
-            for emb_row in old_embeddings:
-                content_bytes = bytes(emb_row['content'])
-                content_hash = hashlib.sha256(content_bytes).hexdigest()
-                memory_id = content_to_memory_id.get(content_hash)
-                
-                if memory_id:
-                    cur.execute(f"""
-                        INSERT INTO {table_name} (memory_id, embedding, namespace, embedding_model)
-                        VALUES (%s, %s, %s, %s)
-                        ON CONFLICT (memory_id, embedding_model) DO NOTHING;
-                    """, (
-                        memory_id,
-                        emb_row['embedding'],
-                        emb_row['namespace'] or 'default',
-                        emb_row['embedding_model']
-                    ))
-            
+
+            cur.execute(sql.SQL("""
+                INSERT INTO memories (content, namespace, labels, source, timestamp, enc, state)
+                SELECT content,
+                       COALESCE(namespace, 'default'),
+                       COALESCE(labels, '[]'::jsonb),
+                       source,
+                       timestamp,
+                       COALESCE(enc, FALSE),
+                       jsonb_build_object('embedding_tables', jsonb_build_array(%s::text))
+                FROM {tbl}
+                ON CONFLICT (content_sha256) DO NOTHING;
+            """).format(tbl=sql.Identifier(table_name)), (table_name,))
+            migrated += cur.rowcount
             conn.commit()
-            logger.info(f"✅ Rebuilt {table_name} with V2 schema")
-        
+
+        logger.info(f"✅ Migrated {migrated} unique memories to memories table")
+
+        # Step 4: Rebuild embedding tables with V2 schema. Each memory_{dims}
+        # table is an independent physical object, so the rebuilds run in a
+        # small thread pool - every worker takes its own connection and the
+        # per-table HNSW builds additionally parallelize inside Postgres.
+        workers = min(4, len(v1_tables))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            for table_name, moved in zip(
+                v1_tables, pool.map(_rebuild_v1_table, v1_tables)
+            ):
+                logger.info(f"✅ Rebuilt {table_name} with V2 schema ({moved} embeddings)")
+
+        # The uniqueness is migration-scoped: runtime stores may legitimately
+        # insert identical content (e.g. the same note in two namespaces), so
+        # drop the helper index and column now that re-linking is done
+        cur.execute("DROP INDEX IF EXISTS idx_memories_sha;")
+        cur.execute("ALTER TABLE memories DROP COLUMN IF EXISTS content_sha256;")
+        conn.commit()
+
         # Step 5: Update system state to V2
         set_system_state(db_version=CURRENT_DB_VERSION)
-        
+
         logger.info("🎉 V1 → V2 migration complete!")
-        
+
     except Exception as e:
         conn.rollback()
         logger.error(f"❌ Migration failed: {e}")
         raise
     finally:
+        try:
+            cur.execute("RESET synchronous_commit;")
+            conn.commit()
+        except Exception:
+            # Connection may be unusable after a failure - putconn discards
+            # broken connections, so a stale setting can't leak
+            pass
         cur.close()
         conn.close()
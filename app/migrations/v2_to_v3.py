@@ -6,17 +6,19 @@ V3 Structure: {"embedding_tables": {"memory_384": ["model1"], "memory_768": ["mo
 
 This migration:
 1. Finds all memories with V2 array format in state.embedding_tables
-2. For each memory, queries embedding tables to find actual models used
+2. Aggregates actual models per memory from each embedding table
 3. Converts to V3 object format with model arrays
 """
 
-import psycopg2
-import psycopg2.extras
+import json
 import logging
 
+import psycopg2.extras
+from psycopg2 import sql
+
 from app.database import (
     get_db_connection,
-    table_exists,
+    get_existing_embedding_tables,
     set_system_state,
 )
 from app.migrations.runner import CURRENT_DB_VERSION
@@ -27,96 +29,106 @@ logger = logging.getLogger(__name__)
 def migrate_v2_to_v3() -> None:
     """
     Migrate from V2 (array) to V3 (object) embedding_tables structure.
-    
+
     V2 Structure: {"embedding_tables": ["memory_384", "memory_768"]}
     V3 Structure: {"embedding_tables": {"memory_384": ["model1"], "memory_768": ["model2"]}}
-    
-    This migration:
-    1. Finds all memories with V2 array format in state.embedding_tables
-    2. For each memory, queries embedding tables to find actual models used
-    3. Converts to V3 object format with model arrays
+
+    Instead of querying each embedding table once per memory (O(memories x
+    tables) round-trips), this runs one aggregation per embedding table and
+    writes all converted states back with a single VALUES-join UPDATE.
     """
     logger.info("🔄 Starting V2 → V3 migration (embedding_tables array → object)...")
-    
+
     conn = get_db_connection()
     cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-    
+
     try:
-        # Find all memories that need migration
-        # V2 format has embedding_tables as an array (jsonb_typeof = 'array')
+        # Temporary GIN index so the repeated "is it still a V2 array"
+        # predicate below becomes an index scan instead of one full memories
+        # scan per embedding table; dropped once migration is done.
+        # jsonb_path_ops is the compact GIN variant that serves @> containment.
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS tmp_v2_scan
+            ON memories USING GIN (state jsonb_path_ops);
+        """)
+        conn.commit()
+
+        # Count memories that need migration. The @> containment only
+        # matches arrays (an empty array is contained in any array but never
+        # in an object), so it is index-serviceable; jsonb_typeof stays as a
+        # defensive post-filter.
         cur.execute("""
-            SELECT id, state->'embedding_tables' as embedding_tables
+            SELECT count(*) AS n
             FROM memories
-            WHERE state->'embedding_tables' IS NOT NULL
+            WHERE state @> '{"embedding_tables": []}'::jsonb
             AND jsonb_typeof(state->'embedding_tables') = 'array';
         """)
-        memories_to_migrate = cur.fetchall()
-        
-        if not memories_to_migrate:
+        total = cur.fetchone()['n']
+
+        if total == 0:
             logger.info("📭 No V2 memories found to migrate")
+            cur.execute("DROP INDEX IF EXISTS tmp_v2_scan;")
+            conn.commit()
             set_system_state(db_version=CURRENT_DB_VERSION)
             return
-        
-        logger.info(f"📋 Found {len(memories_to_migrate)} memories to migrate to V3 format")
-        
-        migrated_count = 0
-        for memory in memories_to_migrate:
-            memory_id = memory['id']
-            old_tables = memory['embedding_tables']  # This is an array like ["memory_384"]
-            
-            # Build new V3 structure by querying each embedding table
-            new_structure = {}
-            
-            for table_name in old_tables:
-                # Check if this table exists
-                if not table_exists(table_name):
-                    logger.debug(f"   Table {table_name} no longer exists, skipping")
-                    continue
-                
-                # Query the embedding table to find models used for this memory
-                try:
-                    cur.execute(f"""
-                        SELECT DISTINCT embedding_model
-                        FROM {table_name}
-                        WHERE memory_id = %s;
-                    """, (memory_id,))
-                    models = [row['embedding_model'] for row in cur.fetchall()]
-                    
-                    if models:
-                        new_structure[table_name] = models
-                    else:
-                        # Table entry exists in state but no embeddings found
-                        # This could happen if embeddings were deleted but state wasn't updated
-                        logger.debug(f"   No embeddings found in {table_name} for memory #{memory_id}")
-                except Exception as e:
-                    logger.warning(f"   Error querying {table_name}: {e}")
-                    continue
-            
-            # Update memory with new V3 structure
-            cur.execute("""
-                UPDATE memories
+
+        logger.info(f"📋 Found {total} memories to migrate to V3 format")
+
+        # One aggregation per embedding table: which models exist for each
+        # V2 memory that actually lists this table in its old array
+        models_by_memory: dict[int, dict[str, list[str]]] = {}
+        for table_name in get_existing_embedding_tables():
+            cur.execute(sql.SQL("""
+                SELECT e.memory_id, array_agg(DISTINCT e.embedding_model) AS models
+                FROM {tbl} e
+                JOIN memories m ON m.id = e.memory_id
+                WHERE m.state @> jsonb_build_object('embedding_tables', jsonb_build_array(%s::text))
+                AND jsonb_typeof(m.state->'embedding_tables') = 'array'
+                GROUP BY e.memory_id;
+            """).format(tbl=sql.Identifier(table_name)), (table_name,))
+            for row in cur.fetchall():
+                models_by_memory.setdefault(row['memory_id'], {})[table_name] = row['models']
+
+        # Write every converted state back in one VALUES-join UPDATE
+        if models_by_memory:
+            psycopg2.extras.execute_values(cur, """
+                UPDATE memories m
                 SET state = jsonb_set(
-                    COALESCE(state, '{}'::jsonb),
+                    COALESCE(m.state, '{}'::jsonb),
                     '{embedding_tables}',
-                    %s::jsonb,
+                    v.obj::jsonb,
                     true
                 )
-                WHERE id = %s;
-            """, (psycopg2.extras.Json(new_structure), memory_id))
-            
-            migrated_count += 1
-            
-            if migrated_count % 100 == 0:
-                conn.commit()
-                logger.info(f"   Migrated {migrated_count}/{len(memories_to_migrate)} memories...")
-        
+                FROM (VALUES %s) AS v(id, obj)
+                WHERE m.id = v.id;
+            """, [(memory_id, json.dumps(structure))
+                  for memory_id, structure in models_by_memory.items()],
+                page_size=1000)
+
+        # Memories whose arrays referenced only dropped tables (or tables
+        # holding no embeddings for them) convert to an empty object, same
+        # as the old per-memory logic
+        cur.execute("""
+            UPDATE memories
+            SET state = jsonb_set(
+                COALESCE(state, '{}'::jsonb),
+                '{embedding_tables}',
+                '{}'::jsonb,
+                true
+            )
+            WHERE state @> '{"embedding_tables": []}'::jsonb
+            AND jsonb_typeof(state->'embedding_tables') = 'array';
+        """)
+        migrated_count = len(models_by_memory) + cur.rowcount
+
+        cur.execute("DROP INDEX IF EXISTS tmp_v2_scan;")
         conn.commit()
-        
+
         # Update system state to V3
         set_system_state(db_version=CURRENT_DB_VERSION)
-        
+
         logger.info(f"🎉 V2 → V3 migration complete! Migrated {migrated_count} memories")
-        
+
     except Exception as e:
         conn.rollback()
         logger.error(f"❌ V2 → V3 migration failed: {e}")
@@ -15,11 +15,13 @@ This migration:
 
 import logging
 
+from app.config import MAINTENANCE_WORK_MEM
 from app.database import (
     get_db_connection,
     get_existing_embedding_tables,
     get_system_state,
     set_system_state,
+    configure_hnsw_params,
 )
 from app.migrations.runner import CURRENT_DB_VERSION
 
@@ -47,47 +49,66 @@ def migrate_v3_to_v4() -> None:
         return
     
     conn = get_db_connection()
+    # Builds and drops run CONCURRENTLY so writers are never blocked behind
+    # a long HNSW build - that requires autocommit (no open transaction)
+    conn.autocommit = True
     cur = conn.cursor()
-    
+
     try:
         # Find all existing memory_{dims} tables
         existing_tables = get_existing_embedding_tables()
-        
+
         if not existing_tables:
             logger.info("📭 No embedding tables found to migrate")
             set_system_state(db_version=CURRENT_DB_VERSION)
             return
-        
+
         logger.info(f"📋 Found {len(existing_tables)} embedding tables to migrate: {existing_tables}")
-        
+
+        # More maintenance memory and parallel workers speed up the graph
+        # builds; session-scoped, reset after the loop
+        cur.execute("SET maintenance_work_mem = %s;", (MAINTENANCE_WORK_MEM,))
+        cur.execute("SET max_parallel_maintenance_workers = 4;")
+
         for table_name in existing_tables:
-            # Extract dimension number from table name (e.g., memory_768 → 768)
-            dims = table_name.replace('memory_', '')
-            
+            # Extract dimension number from table name (e.g., memory_768 → 768).
+            # Parsed as int so the index names interpolated below can only
+            # ever contain digits.
+            dims = int(table_name.replace('memory_', ''))
+
+            # Size build parameters from the table's row estimate
+            cur.execute("SELECT COALESCE(reltuples::BIGINT, 0) FROM pg_class WHERE relname = %s;", (table_name,))
+            row = cur.fetchone()
+            params = configure_hnsw_params(max(0, row[0]) if row else 0)
+
             logger.info(f"📊 Migrating {table_name} index to HNSW...")
-            
-            # Drop old ivfflat index
-            cur.execute(f"DROP INDEX IF EXISTS idx_embedding_{dims};")
-            
-            # Create new HNSW index
+
+            # Build the replacement under a temp name while the old ivfflat
+            # index keeps serving queries, then swap. The initial DROP clears
+            # any half-built leftover from an interrupted earlier run.
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS idx_embedding_{dims}_new;")
             cur.execute(f"""
-                CREATE INDEX idx_embedding_{dims} 
-                ON {table_name} USING hnsw (embedding vector_cosine_ops);
+                CREATE INDEX CONCURRENTLY idx_embedding_{dims}_new
+                ON {table_name} USING hnsw (embedding vector_cosine_ops)
+                WITH (m = {params['m']}, ef_construction = {params['ef_construction']});
             """)
-            
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS idx_embedding_{dims};")
+            cur.execute(f"ALTER INDEX idx_embedding_{dims}_new RENAME TO idx_embedding_{dims};")
+
             logger.info(f"✅ Migrated {table_name} to HNSW index")
-        
-        conn.commit()
-        
+
+        cur.execute("RESET maintenance_work_mem;")
+        cur.execute("RESET max_parallel_maintenance_workers;")
+
         # Update schema version to V4
         set_system_state(db_version=CURRENT_DB_VERSION)
-        
+
         logger.info("🎉 V3 → V4 migration complete!")
-        
+
     except Exception as e:
-        conn.rollback()
         logger.error(f"❌ V3 → V4 migration failed: {e}")
         raise
     finally:
+        conn.autocommit = False
         cur.close()
         conn.close()
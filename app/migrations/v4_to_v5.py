@@ -14,9 +14,8 @@ This migration:
 """
 
 import logging
-import psycopg2.extras
 
-from app.database import get_db_connection, table_exists
+from app.database import get_db_connection, table_exists, Json, _invalidate_system_state_cache
 
 logger = logging.getLogger(__name__)
 
@@ -85,6 +84,7 @@ def migrate_v4_to_v5() -> None:
         logger.info("🗑️ Dropped old system_state table")
         
         conn.commit()
+        _invalidate_system_state_cache()
         
     except Exception as e:
         conn.rollback()
@@ -129,13 +129,15 @@ def _insert_db_version(version: int) -> None:
     conn = get_db_connection()
     cur = conn.cursor()
     try:
-        json_value = psycopg2.extras.Json(version)
+        json_value = Json(version)
         cur.execute("""
             INSERT INTO system_state (key, value) 
             VALUES ('db_version', %s)
             ON CONFLICT (key) DO UPDATE SET value = %s, updated_at = CURRENT_TIMESTAMP;
         """, (json_value, json_value))
         conn.commit()
+        # This writes around set_system_state, so drop its cache explicitly
+        _invalidate_system_state_cache()
         logger.info(f"✅ Set db_version = {version}")
     finally:
         cur.close()
@@ -0,0 +1,68 @@
+"""
+V7 → V8 Migration: Rebuild labels GIN index with jsonb_path_ops
+
+V7 Schema: idx_memories_labels_gin uses the default jsonb_ops opclass
+V8 Schema: same index rebuilt with the jsonb_path_ops opclass
+
+jsonb_path_ops indexes only hash-of-path entries, making them several
+times smaller than jsonb_ops and faster for @> containment lookups -
+the one labels pattern the planner can actually drive through a GIN
+index. Smaller index means a smaller buffer-cache footprint too.
+
+This migration:
+1. Drops the old jsonb_ops index
+2. Recreates it with jsonb_path_ops
+"""
+
+import logging
+
+from app.database import get_db_connection, set_system_state
+
+logger = logging.getLogger(__name__)
+
+
+def migrate_v7_to_v8() -> None:
+    """
+    Migrate from V7 to V8: rebuild the labels GIN index with jsonb_path_ops.
+
+    Idempotent: if the index already uses jsonb_path_ops (fresh installs
+    create it that way), only the version bump happens.
+    """
+    logger.info("🔄 Starting V7 → V8 migration (labels GIN index → jsonb_path_ops)...")
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    try:
+        # Check the current opclass - fresh installs already have the new one
+        cur.execute("""
+            SELECT indexdef FROM pg_indexes
+            WHERE schemaname = 'public' AND indexname = 'idx_memories_labels_gin';
+        """)
+        row = cur.fetchone()
+        if row and 'jsonb_path_ops' in row[0]:
+            logger.info("✅ Labels index already uses jsonb_path_ops, skipping rebuild")
+            set_system_state(db_version=8)
+            return
+
+        logger.info("📋 Rebuilding idx_memories_labels_gin with jsonb_path_ops...")
+        cur.execute("DROP INDEX IF EXISTS idx_memories_labels_gin;")
+        cur.execute("""
+            CREATE INDEX idx_memories_labels_gin
+            ON memories USING GIN (labels jsonb_path_ops);
+        """)
+        conn.commit()
+        logger.info("✅ Rebuilt labels GIN index with jsonb_path_ops")
+
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"❌ V7 → V8 migration failed: {e}")
+        raise
+    finally:
+        cur.close()
+        conn.close()
+
+    # Update db_version to 8
+    set_system_state(db_version=8)
+
+    logger.info("🎉 V7 → V8 migration complete!")
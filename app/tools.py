@@ -1,9 +1,8 @@
 
-from app.database import get_db_connection, add_embedding_to_state, get_memory_embedding_tables
+from app.database import get_db_connection, add_embedding_to_state, get_memory_embedding_tables, configure_search_params, Json
 from app.embedding import get_embedding, get_embedding_dimension
 from app.utils import tokenize_labels, update_label_token_popularity
-import psycopg2.extras
-from app.config import EMBEDDING_MODEL, NAMESPACE, TIMEZONE, TIMEZONE_DISABLED, PERFORMANCE_METRICS
+from app.config import EMBEDDING_MODEL, NAMESPACE, TIMEZONE, TIMEZONE_DISABLED, PERFORMANCE_METRICS, USE_HALFVEC
 import time
 from app.encryption import (
     encrypt_content,
@@ -19,6 +18,11 @@ from datetime import datetime, timezone
 # Get logger
 logger = logging.getLogger(__name__)
 
+# Cast for embedding parameters - must match the column type: pgvector has
+# no cross-type distance operators, so a ::vector parameter against a
+# halfvec column would miss the ANN index (or fail to resolve at all)
+_VECTOR_CAST = "halfvec" if USE_HALFVEC else "vector"
+
 
 # =============================================================================
 # Related Memories Helper Functions
@@ -121,7 +125,7 @@ def update_related_backlinks(new_memory_id: int, new_content_id: int, new_labels
                 # Update the related memory's state
                 cur.execute(
                     "UPDATE memories SET state = %s WHERE id = %s",
-                    (psycopg2.extras.Json(current_state), related_id)
+                    (Json(current_state), related_id)
                 )
         
         conn.commit()
@@ -177,7 +181,7 @@ def cleanup_related_on_delete(memory_id: int, namespace: str, cur, conn) -> None
             # Update the memory's state
             cur.execute(
                 "UPDATE memories SET state = %s WHERE id = %s",
-                (psycopg2.extras.Json(ref_state), ref_id)
+                (Json(ref_state), ref_id)
             )
         
         logger.debug(f"🧹 Cleaned up related references from {len(referencing_memories)} memories")
@@ -661,8 +665,11 @@ def store_memory(content: str, labels: str = None, source: str = None, mcp_setti
     # Capture top 2 for related_memories feature (unified response format)
     related_memories_data = []  # For storing in state.related
     try:
+        # Size ANN search params for this transaction from the table's row count
+        configure_search_params(conn, embedding_dim)
+
         check_sql = f"""
-            SELECT m.id, m.content, m.enc, 1 - (e.embedding <=> %s::vector) as similarity, m.content_id, m.labels
+            SELECT m.id, m.content, m.enc, 1 - (e.embedding <=> %s::{_VECTOR_CAST}) as similarity, m.content_id, m.labels
             FROM memories m
             JOIN {table_name} e ON m.id = e.memory_id
             WHERE e.namespace = %s AND e.embedding_model = %s
@@ -676,7 +683,7 @@ def store_memory(content: str, labels: str = None, source: str = None, mcp_setti
             mem_id, mem_content_bytes, mem_enc, similarity, mem_content_id, mem_labels = row
             # Safely decode or decrypt content for comparison
             mem_enc = mem_enc if mem_enc is not None else False
-            mem_content = decode_or_decrypt_content(bytes(mem_content_bytes), mem_enc)
+            mem_content = decode_or_decrypt_content(mem_content_bytes, mem_enc)
             if mem_content is None:
                 # Skip encrypted memories we can't decrypt for duplicate detection
                 continue
@@ -724,10 +731,10 @@ def store_memory(content: str, labels: str = None, source: str = None, mcp_setti
             next_content_id,
             content_bytes,
             namespace,
-            psycopg2.extras.Json(label_list),
+            Json(label_list),
             source,
             is_encrypted,
-            psycopg2.extras.Json(initial_state)
+            Json(initial_state)
         )
     )
     memory_id = cur.fetchone()[0]
@@ -735,7 +742,7 @@ def store_memory(content: str, labels: str = None, source: str = None, mcp_setti
     # V2: Step 2 - Insert embedding into memory_{dims} table
     cur.execute(
         f"""INSERT INTO {table_name} (memory_id, embedding, namespace, embedding_model)
-        VALUES (%s, %s::vector, %s, %s);""",
+        VALUES (%s, %s::{_VECTOR_CAST}, %s, %s);""",
         (memory_id, embedding, namespace, embedding_model)
     )
 
@@ -867,11 +874,13 @@ def retrieve_memories(query: str = None, labels: str = None, source: str = None,
     cur = conn.cursor()
     
     if query:
-        
+        # Size ANN search params for this transaction from the table's row count
+        configure_search_params(conn, embedding_dim)
+
         # Build SQL query with JOIN to memories table
         sql = f"""
             SELECT m.id, m.content, e.embedding_model, m.namespace, m.labels, m.source, m.timestamp, 
-                   1 - (e.embedding <=> %s::vector) as similarity, m.enc, m.state, m.content_id
+                   1 - (e.embedding <=> %s::{_VECTOR_CAST}) as similarity, m.enc, m.state, m.content_id
             FROM memories m
             JOIN {table_name} e ON m.id = e.memory_id
         """
@@ -936,7 +945,7 @@ def retrieve_memories(query: str = None, labels: str = None, source: str = None,
             if len(memories) >= num_results:
                 break
                 
-            content_bytes = bytes(row[1])
+            content_bytes = row[1]
             is_encrypted = row[8] if row[8] is not None else False
             
             # Decode or decrypt content
@@ -1043,7 +1052,7 @@ def retrieve_memories(query: str = None, labels: str = None, source: str = None,
             if len(memories) >= num_results:
                 break
                 
-            content_bytes = bytes(row[1])
+            content_bytes = row[1]
             is_encrypted = row[6] if row[6] is not None else False
             
             # Decode or decrypt content
@@ -1309,7 +1318,7 @@ def get_memory(memory_id: int) -> dict:
         result = cur.fetchone()
         
         if result:
-            content_bytes = bytes(result[1])
+            content_bytes = result[1]
             is_encrypted = result[6] if result[6] is not None else False
             
             # Decode or decrypt content
@@ -1481,7 +1490,7 @@ def random_memory(labels: str = None, source: str = None) -> dict:
         
         # Try to find a memory we can decrypt
         for result in results:
-            content_bytes = bytes(result[1])
+            content_bytes = result[1]
             is_encrypted = result[6] if result[6] is not None else False
             
             # Decode or decrypt content
@@ -1641,7 +1650,7 @@ def add_labels(memory_id: int, labels: str) -> dict:
             SET labels = %s
             WHERE id = %s;
         """
-        cur.execute(update_sql, (psycopg2.extras.Json(merged_labels), memory_id))
+        cur.execute(update_sql, (Json(merged_labels), memory_id))
         conn.commit()
         db_time = time.time() - db_start
         total_time = time.time() - total_start
@@ -2103,7 +2112,7 @@ def del_labels(memory_id: int, labels: str) -> dict:
             SET labels = %s
             WHERE id = %s;
         """
-        cur.execute(update_sql, (psycopg2.extras.Json(remaining_labels), memory_id))
+        cur.execute(update_sql, (Json(remaining_labels), memory_id))
         conn.commit()
         
         db_time = time.time() - db_start
@@ -2283,7 +2292,7 @@ def replace_labels(memory_id: int, target: str, new: str) -> dict:
             SET labels = %s
             WHERE id = %s;
         """
-        cur.execute(update_sql, (psycopg2.extras.Json(updated_labels), memory_id))
+        cur.execute(update_sql, (Json(updated_labels), memory_id))
         conn.commit()
         
         db_time = time.time() - db_start